@@ -0,0 +1,81 @@
+"""Benchmark the pairwise delta_r kernel against the dense n_jets x n_jets formulation.
+
+Run with `python benchmarks/delta_r.py`.
+"""
+import time
+import tracemalloc
+
+import numpy as np
+
+from diquark.features.definitions import delta_r
+
+
+def dense_delta_r(etas: np.ndarray, phis: np.ndarray, pts: np.ndarray) -> np.ndarray:
+    """Reference: full delta_r matrices, with the upper triangle gathered by index."""
+    n_events, n_jets = etas.shape
+
+    delta_eta = etas[:, :, None] - etas[:, None, :]
+    delta_phi = phis[:, :, None] - phis[:, None, :]
+    delta_phi = np.where(delta_phi > np.pi, delta_phi - 2 * np.pi, delta_phi)
+    delta_phi = np.where(delta_phi < -np.pi, delta_phi + 2 * np.pi, delta_phi)
+
+    delta_r_matrix = np.sqrt(delta_eta**2 + delta_phi**2)
+    delta_r_matrix *= pts[:, :, None] * pts[:, None, :] > 0
+
+    first, second = np.triu_indices(n_jets, 1)
+    return delta_r_matrix[:, first, second]
+
+
+def padded_jets(n_events: int, n_jets: int, rng: np.random.Generator) -> tuple[np.ndarray, ...]:
+    multiplicities = rng.integers(0, n_jets + 1, n_events)
+    present = np.arange(n_jets) < multiplicities[:, None]
+
+    etas = (rng.normal(0.0, 2.0, (n_events, n_jets)) * present).astype(np.float32)
+    phis = (rng.uniform(-np.pi, np.pi, (n_events, n_jets)) * present).astype(np.float32)
+    pts = (rng.exponential(100.0, (n_events, n_jets)) * present).astype(np.float32)
+    return etas, phis, pts
+
+
+def best_of(function, *args, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def peak_memory(function, *args) -> int:
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    rng = np.random.default_rng(17)
+    n_events = 50_000
+
+    print(
+        f"{'n_jets':>6}{'pairs':>8}{'dense [s]':>12}{'pairs [s]':>12}{'speedup':>10}"
+        f"{'dense [MB]':>13}{'pairs [MB]':>13}"
+    )
+    for n_jets in (6, 10, 20, 32):
+        etas, phis, pts = padded_jets(n_events, n_jets, rng)
+
+        expected = dense_delta_r(etas, phis, pts)
+        result = delta_r(etas, phis, pts)
+        assert result.dtype == np.float32
+        np.testing.assert_array_equal(result, expected)
+
+        dense = best_of(dense_delta_r, etas, phis, pts)
+        pairs = best_of(delta_r, etas, phis, pts)
+        dense_memory = peak_memory(dense_delta_r, etas, phis, pts) / 1024**2
+        pairs_memory = peak_memory(delta_r, etas, phis, pts) / 1024**2
+        print(f"{n_jets:>6}{expected.shape[1]:>8}{dense:>12.3f}{pairs:>12.3f}{dense / pairs:>9.1f}x"
+              f"{dense_memory:>13.1f}{pairs_memory:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
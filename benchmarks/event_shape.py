@@ -0,0 +1,85 @@
+"""Benchmark the closed-form event-shape eigenvalues against the per-component np.linalg version.
+
+Run with `python benchmarks/event_shape.py`.
+"""
+import time
+import tracemalloc
+
+import numpy as np
+
+from diquark.features.definitions import event_shape_eigenvalues
+
+
+def linalg_eigenvalues(
+    mask: np.ndarray, p_x: np.ndarray, p_y: np.ndarray, p_z: np.ndarray
+) -> np.ndarray:
+    """Reference: the sphericity tensor filled component by component, solved with eigvalsh."""
+    momenta = np.stack((p_x, p_y, p_z))
+    momenta = np.moveaxis(momenta, 0, -1)
+    total = (momenta * momenta).sum(axis=-1).sum(axis=-1)
+
+    S = np.zeros((mask.sum(), 3, 3))
+    for i in range(3):
+        for j in range(3):
+            S[:, i, j] = np.vecdot(momenta[mask, :, i], momenta[mask, :, j]) / total[mask]
+
+    return np.sort(np.linalg.eigvalsh(S), axis=-1)
+
+
+def padded_momenta(n_events: int, n_jets: int, rng: np.random.Generator) -> tuple[np.ndarray, ...]:
+    multiplicities = rng.integers(0, n_jets + 1, n_events)
+    present = np.arange(n_jets) < multiplicities[:, None]
+
+    pts = rng.exponential(100.0, (n_events, n_jets))
+    etas = rng.normal(0.0, 2.0, (n_events, n_jets))
+    phis = rng.uniform(-np.pi, np.pi, (n_events, n_jets))
+
+    p_x = (pts * np.cos(phis) * present).astype(np.float32)
+    p_y = (pts * np.sin(phis) * present).astype(np.float32)
+    p_z = (pts * np.sinh(etas) * present).astype(np.float32)
+    return multiplicities > 0, p_x, p_y, p_z
+
+
+def best_of(function, *args, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def peak_memory(function, *args) -> int:
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    rng = np.random.default_rng(17)
+    n_events = 100_000
+
+    print(
+        f"{'n_jets':>6}{'linalg [s]':>12}{'closed [s]':>12}{'speedup':>10}"
+        f"{'linalg [MB]':>13}{'closed [MB]':>13}"
+    )
+    for n_jets in (6, 10, 20, 32):
+        momenta = padded_momenta(n_events, n_jets, rng)
+
+        # Validate against np.linalg on the same tensors built in float64
+        mask, p_x, p_y, p_z = momenta
+        expected = linalg_eigenvalues(mask, *(p.astype(np.float64) for p in (p_x, p_y, p_z)))
+        np.testing.assert_allclose(event_shape_eigenvalues(*momenta), expected, rtol=0, atol=1e-9)
+
+        linalg = best_of(linalg_eigenvalues, *momenta)
+        closed = best_of(event_shape_eigenvalues, *momenta)
+        linalg_memory = peak_memory(linalg_eigenvalues, *momenta) / 1024**2
+        closed_memory = peak_memory(event_shape_eigenvalues, *momenta) / 1024**2
+        print(f"{n_jets:>6}{linalg:>12.3f}{closed:>12.3f}{linalg / closed:>9.1f}x"
+              f"{linalg_memory:>13.1f}{closed_memory:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
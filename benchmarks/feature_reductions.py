@@ -0,0 +1,68 @@
+"""Benchmark RunningStatistics.from_lists against per-statistic awkward reductions.
+
+Run with `python benchmarks/feature_reductions.py`.
+"""
+import time
+from math import comb
+
+import numpy as np
+import awkward as ak
+
+from diquark.features.reductions import RunningStatistics
+
+
+def awkward_reductions(name: str, data: ak.Array) -> dict:
+    return {
+        f"{name}_min": ak.min(data, axis=-1, mask_identity=True).to_numpy().filled(0.0),
+        f"{name}_mean": ak.mean(data, axis=-1, mask_identity=True).to_numpy().filled(0.0),
+        f"{name}_stddev": ak.std(data, axis=-1, mask_identity=True).to_numpy().filled(0.0),
+        f"{name}_max": ak.max(data, axis=-1, mask_identity=True).to_numpy().filled(0.0),
+    }
+
+
+def random_lists(counts: np.ndarray, rng: np.random.Generator) -> ak.Array:
+    content = rng.exponential(1000.0, counts.sum()).astype(np.float32)
+    return ak.unflatten(content, counts)
+
+
+def best_of(function, *args, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    rng = np.random.default_rng(17)
+    n_events = 100_000
+    multiplicities = rng.integers(0, 13, n_events)
+
+    cases = {
+        "p_T": multiplicities,
+        "m2j": np.array([comb(n, 2) for n in multiplicities]),
+        "m3j": np.array([comb(n, 3) for n in multiplicities]),
+        "m6j": np.array([comb(n, 6) for n in multiplicities]),
+    }
+
+    print(f"{'feature':<10}{'entries':>12}{'awkward [s]':>14}{'fused [s]':>12}{'speedup':>10}")
+    for name, counts in cases.items():
+        data = random_lists(counts, rng)
+
+        # Validate against awkward in float64: older awkward releases reduce float32
+        # input in float32, which can even turn a single-jet variance negative
+        expected = awkward_reductions(name, ak.values_astype(data, np.float64))
+        result = RunningStatistics.from_lists(data).flatten(name)
+        for key in expected:
+            np.testing.assert_allclose(result[key], expected[key], rtol=1e-10)
+
+        baseline = best_of(awkward_reductions, name, data)
+        fused = best_of(lambda data: RunningStatistics.from_lists(data).flatten(name), data)
+        print(
+            f"{name:<10}{counts.sum():>12}{baseline:>14.3f}{fused:>12.3f}{baseline / fused:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark time-to-features of the pipeline backend against loading all datasets, then extracting.
+
+Writes Delphes-like files to a temporary directory and compares the
+staged path (DataLoader.load_data, then FeatureExecutor.extract) with the
+'pipeline' backend, next to the time spent on reading alone and on
+extraction alone. Run with `python benchmarks/pipeline.py`.
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from diquark.data.loader import DataLoader
+from diquark.features.executor import FeatureExecutor
+from diquark.features.feature_extractor import FeatureExtractor
+
+from skim import write_delphes
+
+
+def main():
+    rng = np.random.default_rng(17)
+    n_files = 12
+    n_events = 20_000
+    mass_cut = 4000
+    max_workers = 8
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        path_dict = {}
+        for i in range(n_files):
+            key = "SIG:Suu" if i == 0 else f"BKG:process_{i}"
+            path_dict[key] = directory / f"{key.replace(':', '_')}.root"
+            write_delphes(path_dict[key], n_events, rng)
+        keys = list(path_dict)
+
+        feature_extractor = FeatureExtractor(n_jets=6, chi_mass=1500, suu_mass=4000)
+        data_loader = DataLoader(path_dict, branches=feature_extractor.branches())
+
+        start = time.perf_counter()
+        data = data_loader.load_data(mass_cut, keys)
+        read_time = time.perf_counter() - start
+
+        staged = FeatureExecutor(
+            data_loader, feature_extractor, backend="threads", max_workers=max_workers
+        )
+        start = time.perf_counter()
+        expected = staged.extract(data)
+        extract_time = time.perf_counter() - start
+
+        pipeline = FeatureExecutor(
+            data_loader, feature_extractor, backend="pipeline", max_workers=max_workers
+        )
+        start = time.perf_counter()
+        features = pipeline.run(keys, mass_cut)
+        pipeline_time = time.perf_counter() - start
+
+        for key in keys:
+            for name in feature_extractor.feature_names:
+                np.testing.assert_allclose(features[key][name], expected[key][name], rtol=1e-12)
+
+        print(f"{n_files} files of {n_events} events, {max_workers} extraction threads")
+        print(
+            f"read {read_time:.2f}s + extract {extract_time:.2f}s = "
+            f"staged {read_time + extract_time:.2f}s"
+        )
+        print(
+            f"pipeline {pipeline_time:.2f}s, "
+            f"{(read_time + extract_time) / pipeline_time:.2f}x faster, "
+            f"max(read, extract) is {max(read_time, extract_time):.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
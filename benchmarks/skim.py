@@ -0,0 +1,128 @@
+"""Benchmark loading datasets from their Parquet skims against reading the Delphes ROOT files.
+
+Writes Delphes-like files of random events (jets and generator particles) to a
+temporary directory, skims them, and times loading all of them both ways.
+The files are in the page cache, so this measures decompression and
+interpretation, not disk reads. Run with `python benchmarks/skim.py`.
+"""
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import awkward as ak
+import uproot
+
+from diquark.data.loader import DataLoader, SUU_PID, HARD_PROCESS_STATUS
+
+
+def jagged(rng: np.random.Generator, counts: np.ndarray, values) -> ak.Array:
+    return ak.unflatten(values(rng, counts.sum()), counts)
+
+
+def write_delphes(path: Path, n_events: int, rng: np.random.Generator, basket_events: int = 1000):
+    """A Delphes-like TTree, filled in baskets of a thousand events."""
+    branches = {
+        "Jet": "int32",
+        "Jet/Jet.PT": "var * float32",
+        "Jet/Jet.Eta": "var * float32",
+        "Jet/Jet.Phi": "var * float32",
+        "Particle/Particle.PID": "var * int32",
+        "Particle/Particle.Status": "var * int32",
+        "Particle/Particle.Mass": "var * float32",
+    }
+    with uproot.recreate(path) as f:
+        tree = f.mktree("Delphes", branches)
+        for start in range(0, n_events, basket_events):
+            n = min(basket_events, n_events - start)
+            n_jets = rng.integers(0, 15, n).astype(np.int32)
+            n_particles = rng.integers(300, 700, n)
+
+            pid = jagged(
+                rng, n_particles, lambda rng, size: rng.integers(-30, 30, size).astype(np.int32)
+            )
+            status = jagged(
+                rng, n_particles, lambda rng, size: rng.integers(1, 80, size).astype(np.int32)
+            )
+            # The Suu is the first generator particle of every event
+            suu = np.zeros(len(ak.flatten(pid)), dtype=bool)
+            suu[np.cumsum(n_particles) - n_particles] = True
+            pid = ak.unflatten(np.where(suu, SUU_PID, ak.flatten(pid)), n_particles)
+            status = ak.unflatten(
+                np.where(suu, HARD_PROCESS_STATUS, ak.flatten(status)), n_particles
+            )
+
+            tree.extend(
+                {
+                    "Jet": n_jets,
+                    "Jet/Jet.PT": jagged(
+                        rng, n_jets, lambda rng, size: rng.exponential(200, size).astype(np.float32)
+                    ),
+                    "Jet/Jet.Eta": jagged(
+                        rng, n_jets, lambda rng, size: rng.normal(0, 1.5, size).astype(np.float32)
+                    ),
+                    "Jet/Jet.Phi": jagged(
+                        rng,
+                        n_jets,
+                        lambda rng, size: rng.uniform(-np.pi, np.pi, size).astype(np.float32),
+                    ),
+                    "Particle/Particle.PID": pid,
+                    "Particle/Particle.Status": status,
+                    "Particle/Particle.Mass": jagged(
+                        rng,
+                        n_particles,
+                        lambda rng, size: rng.uniform(0, 9000, size).astype(np.float32),
+                    ),
+                }
+            )
+
+
+def load_all(loader: DataLoader, mass_cut: float) -> dict[str, ak.Array]:
+    return {key: loader.load_dataset(key, mass_cut)[1] for key in loader.path_dict}
+
+
+def main():
+    rng = np.random.default_rng(17)
+    n_files = 6
+    n_events = 20_000
+    mass_cut = 4000
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        path_dict = {}
+        for i in range(n_files):
+            key = "SIG:Suu" if i == 0 else f"BKG:process_{i}"
+            path_dict[key] = directory / f"{key.replace(':', '_')}.root"
+            write_delphes(path_dict[key], n_events, rng)
+
+        root_loader = DataLoader(path_dict)
+        skim_loader = DataLoader(path_dict, skim_dir=directory / "skims")
+
+        start = time.perf_counter()
+        manifests = skim_loader.skim_data(list(path_dict), max_workers=1)
+        skim_time = time.perf_counter() - start
+
+        root_bytes = sum(path.stat().st_size for path in path_dict.values())
+        skim_bytes = sum(manifest["bytes"] for manifest in manifests.values())
+        print(f"{n_files} files of {n_events} events: ROOT {root_bytes / 1024**2:.1f} MB, "
+              f"skims {skim_bytes / 1024**2:.1f} MB, written in {skim_time:.2f}s")
+
+        start = time.perf_counter()
+        from_root = load_all(root_loader, mass_cut)
+        root_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        from_skims = load_all(skim_loader, mass_cut)
+        skim_time = time.perf_counter() - start
+
+        for key in path_dict:
+            assert from_root[key].fields == from_skims[key].fields
+            for field in from_root[key].fields:
+                assert ak.all(from_root[key][field] == from_skims[key][field])
+
+        print(f"load with mass cut: ROOT {root_time:.3f}s, skims {skim_time:.3f}s, "
+              f"{root_time / skim_time:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
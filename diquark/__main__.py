@@ -0,0 +1,3 @@
+from diquark.cli import main
+
+main()
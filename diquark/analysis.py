@@ -1,170 +1,791 @@
-from tqdm.contrib.concurrent import thread_map
 import argparse
+import copy
+import hashlib
+import json
+import os
 import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
+import joblib
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import StratifiedKFold
 from diquark.config.config_manager import ConfigManager
 from diquark.utils.logger import setup_logger
 from diquark.utils.results_manager import ResultsManager
-from diquark.data.loader import DataLoader
+from diquark.utils.feature_cache import FeatureCache
+from diquark.utils.profiling import Profiler, cprofile_to
+from diquark.data.loader import DataLoader, shared_executor
+from diquark.data.file_index import FileIndex
 from diquark.features.feature_extractor import FeatureExtractor
+from diquark.features.executor import FeatureExecutor, stream_feature_batches
 from diquark.data.preprocessor import Preprocessor
 # from diquark.models.neural_network import NeuralNetworkModel
 from diquark.models.random_forest import RandomForestModel
 from diquark.models.gradient_boosting import GradientBoostingModel
 from diquark.evaluation.metrics import calculate_metrics, calculate_signal_background_metrics, calculate_counts_for_score_cuts
+from diquark.evaluation.score_distribution import ScoreDistribution
 from diquark.evaluation.visualizations import plot_results
 from diquark.config import constants
 
+
+def create_feature_extractor(config: ConfigManager) -> FeatureExtractor:
+    return FeatureExtractor(
+        n_jets=config.get('feature_extraction.n_jets', 6),
+        chi_mass=config.get('feature_extraction.chi_mass', 2000),
+        suu_mass=config.get('feature_extraction.suu_mass', 7500),
+        combination_block_size=config.get('feature_extraction.combination_block_size', 2**20),
+        features=config.get('feature_extraction.features', None),
+    )
+
+
+def dataset_events(config: ConfigManager, path_dict: dict, key: str) -> tuple:
+    """Identify the events of a dataset, in order: its file and the event selection applied."""
+    # The Suu mass cut is only applied to signal datasets
+    mass_cut = config.get('data.mass_cut') if key.startswith('SIG') else None
+    return (
+        str(path_dict[key]),
+        config.get('data.index_start', 0),
+        config.get('data.index_stop', None),
+        mass_cut,
+    )
+
+
+def dataset_key(config: ConfigManager, path_dict: dict, key: str) -> tuple:
+    """Identify the events read for a dataset and the branches read."""
+    return (
+        *dataset_events(config, path_dict, key),
+        tuple(create_feature_extractor(config).branches()),
+    )
+
+
+def create_sweep_logger(config: ConfigManager):
+    """Logger of a whole sweep, writing to the first config's log file."""
+    return setup_logger('sweep_logger', config.get('logging.file_path', 'logs/experiment.log'),
+                        level=config.get('logging.level', 'INFO'))
+
+
 class Analysis:
     def __init__(self, config_path: str):
         self.config = ConfigManager(config_path)
-        self.logger = setup_logger('experiment_logger',
+        # One logger per config, so configs running in the same process keep separate logs
+        self.logger = setup_logger(f'experiment_logger[{config_path}]',
                                    self.config.get('logging.file_path', 'logs/experiment.log'),
                                    level=self.config.get('logging.level', 'INFO'))
         self.results_manager = ResultsManager(self.config.get('results.directory', 'results'))
 
-
         # Load path_dict and cross_sections from constants
         self.path_dict = getattr(constants, self.config.get('data.path_dict'))  # Adjust as needed
         self.cross_sections = getattr(constants, self.config.get('data.cross_section_dict'))  # Adjust as needed
 
         self.use_cross_validation = self.config.get('cross_validation.enabled', False)
         self.n_folds = self.config.get('cross_validation.n_folds', 1)
+        self.max_parallel_folds = self.config.get('cross_validation.max_parallel_folds', 1)
+        self.compact = self.config.get('preprocessing.compact', False)
+        self.persist_models = self.config.get('results.save_models', False)
+
+        self.profiler = Profiler(self.logger,
+                                 enabled=self.config.get('profiling.enabled', True),
+                                 interval=self.config.get('profiling.rss_interval_s', 0.1))
+        self.cprofile = self.config.get('profiling.cprofile', False)
+
+        self.feature_extractor = create_feature_extractor(self.config)
+        # Only the branches the selected features read are loaded
+        self.data_loader = DataLoader(
+            self.path_dict,
+            index_start=self.config.get('data.index_start', 0),
+            index_stop=self.config.get('data.index_stop', None),
+            step_size=self.config.get('data.step_size', None),
+            branches=self.feature_extractor.branches(),
+            skim_dir=self.config.get('data.skim_dir', None),
+            file_index=self.create_file_index(),
+            split_bytes=int(self.config.get('data.split_mb', 256) * 1024**2),
+            executor=self.create_io_executor(),
+            max_concurrent_reads=self.config.get('data.max_concurrent_reads', None),
+        )
 
-        self.data_loader = DataLoader(self.path_dict,
-                                      index_start=self.config.get('data.index_start', 0),
-                                      index_stop=self.config.get('data.index_stop', None))
-
-        self.feature_extractor = FeatureExtractor(
-            n_jets=self.config.get('feature_extraction.n_jets', 6),
-            chi_mass=self.config.get('feature_extraction.chi_mass', 2000),
-            suu_mass=self.config.get('feature_extraction.suu_mass', 7500),
+        self.feature_executor = FeatureExecutor(
+            self.data_loader,
+            self.feature_extractor,
+            backend=self.config.get('feature_extraction.backend', 'threads'),
+            max_workers=self.config.get('feature_extraction.max_workers', 32),
+            scratch_dir=self.config.get('feature_extraction.scratch_dir', None),
+            io_workers=self.config.get('feature_extraction.io_workers', 4),
+            prefetch_chunks=self.config.get('feature_extraction.prefetch_chunks', None),
         )
+        self.feature_cache = FeatureCache(
+            self.config.get('feature_cache.directory', 'cache/features'),
+            max_bytes=int(self.config.get('feature_cache.max_size_gb', 50) * 1024**3),
+        ) if self.config.get('feature_cache.enabled', True) else None
+
         self.preprocessor = Preprocessor(self.config.get('preprocessing', {}))
 
-        self.models = {
+        self.models = self.create_models()
+
+        # Set by Sweep to share loaded datasets and continue training from the previous config's
+        # models
+        self.shared_data = None
+        self.warm_start_models = {}
+        self.trained_models = {}
+        self.saved_models = {}
+
+    def create_file_index(self):
+        """Index of the ROOT files' entries and baskets, shared by configs with one index file."""
+        path = self.config.get('data.file_index', 'cache/file_index.json')
+        return FileIndex(path) if path else None
+
+    def create_io_executor(self):
+        """Thread pool for uproot's decompression and interpretation, shared by all configs."""
+        io_threads = self.config.get('data.io_threads', None)
+        return shared_executor(io_threads) if io_threads else None
+
+    def create_models(self, n_jobs=None):
+        """Create fresh model instances, optionally overriding their number of threads."""
+        def model_config(name):
+            config = self.config.get(f'models.{name}', {})
+            return {**config, 'n_jobs': n_jobs} if n_jobs is not None else config
+
+        return {
             # 'neural_network': NeuralNetworkModel(self.config.get('models.neural_network', {})) if self.config.get('models.neural_network', None) else None,
-            'random_forest': RandomForestModel(self.config.get('models.random_forest', {})) if self.config.get('models.random_forest', None) else None,
-            'gradient_boosting': GradientBoostingModel(self.config.get('models.gradient_boosting', {})) if self.config.get('models.gradient_boosting', None) else None
+            'random_forest': (
+                RandomForestModel(model_config('random_forest'))
+                if self.config.get('models.random_forest', None)
+                else None
+            ),
+            'gradient_boosting': (
+                GradientBoostingModel(model_config('gradient_boosting'))
+                if self.config.get('models.gradient_boosting', None)
+                else None
+            ),
         }
 
     def run(self):
         self.logger.info("Starting analysis...")
 
-        # Load data
-        data = self.load_data()
-
-        # Extract features
-        features = self.extract_features(data)
-
-        if self.use_cross_validation:
-            self.run_cross_validation(features)
-        else:
-            self.run_single_fold(features)
-
+        profile_path = (
+            self.results_manager.results_dir / "profile.pstats" if self.cprofile else None
+        )
+        with cprofile_to(profile_path), self.profiler.stage('run'):
+            # Reuse cached features and only load the datasets that still need extraction
+            with self.profiler.stage('feature_cache'):
+                features = self.load_cached_features()
+            keys = [key for key in dict.fromkeys(constants.DATA_KEYS) if key not in features]
+
+            if (
+                self.feature_executor.backend in ('processes', 'pipeline')
+                or self.data_loader.step_size is not None
+            ):
+                # Workers read (or stream) their own datasets straight into the feature extractor
+                with self.profiler.stage('read_and_extract', datasets=len(keys)):
+                    features |= self.read_and_extract_features(keys)
+            else:
+                with self.profiler.stage('load', datasets=len(keys)):
+                    data = self.load_data(keys)
+
+                # Extract features
+                with self.profiler.stage('extract', datasets=len(keys)):
+                    features |= self.extract_features(data)
+
+            self.save_feature_timings()
+            features = {key: features[key] for key in constants.DATA_KEYS}
+
+            if self.compact:
+                # Pack the features once so the per-dataset columns can be freed
+                with self.profiler.stage('pack'):
+                    features = self.preprocessor.create_feature_matrix(features)
+
+            if self.use_cross_validation:
+                self.run_cross_validation(features)
+            else:
+                self.run_single_fold(features)
+
+            self.save_model_manifest()
+
+        self.save_timings()
         self.logger.info("Analysis completed.")
 
     def run_single_fold(self, features):
         # Preprocess data
-        X_train, X_test, y_train, y_test, df_train, df_test = self.preprocess_data(features)
+        with self.profiler.stage('preprocess'):
+            if self.compact:
+                train_index, test_index = self.preprocessor.split_indices(features.target)
+                X_train, X_test, y_train, y_test = self.preprocessor.prepare_matrix_data(
+                    features, train_index, test_index
+                )
+                truth_test = features.truth(test_index)
+            else:
+                X_train, X_test, y_train, y_test, df_train, df_test = self.preprocess_data(features)
+                truth_test = df_test['Truth']
 
         # Train and evaluate models
-        results = self.train_and_evaluate_models(X_train, X_test, y_train, y_test, df_test)
+        self.warm_start(self.models, 0, X_train.shape[1])
+        results = self.train_and_evaluate_models(
+            X_train,
+            X_test,
+            y_train,
+            y_test,
+            truth_test,
+            sample_weight=self.preprocessor.sample_weights(y_train),
+        )
+        self.record_trained_models(self.models, 0)
+        self.save_fold_models(0, self.models, self.preprocessor.scaler)
+
+        if self.compact:
+            # Only the saved test set needs a DataFrame
+            df_test = features.to_dataframe(test_index)
 
         # Visualize results
-        self.visualize_results(results, df_test)
+        with self.profiler.stage('visualize'):
+            self.visualize_results(results, df_test)
 
         # Save results
-        self.save_results(results, df_test)
+        with self.profiler.stage('save'):
+            self.save_results(results, df_test)
 
     def run_cross_validation(self, features):
-        df = self.preprocessor.create_dataframe(features)
-        X = df.drop(["target", "Truth"], axis=1)
-        y = df["target"]
-
-        skf = StratifiedKFold(n_splits=self.n_folds, shuffle=True, random_state=42)
+        if self.compact:
+            df = features
+            X, y = features.X, features.target
+            folds = self.fold_indices(features.truth())
+        else:
+            df = self.preprocessor.create_dataframe(features)
+            X = df.drop(["target", "Truth"], axis=1)
+            y = df["target"]
+            folds = self.fold_indices(df["Truth"])
 
-        all_fold_results = []
+        n_parallel = max(1, min(self.max_parallel_folds, len(folds)))
 
-        for fold, (train_index, test_index) in enumerate(skf.split(X, y), 1):
-            self.logger.info(f"Processing fold {fold}")
+        if n_parallel == 1:
+            all_fold_results = [self.run_fold(fold, train_index, test_index, df, X, y)
+                                for fold, (train_index, test_index) in folds]
+        else:
+            # Split the cores between concurrent folds and the models' own threads
+            n_jobs = max(1, (os.cpu_count() or 1) // n_parallel)
+            self.logger.info(
+                f"Running {len(folds)} folds, {n_parallel} at a time "
+                f"with {n_jobs} threads per model"
+            )
+
+            # Record the folds' stages under this thread's open stages
+            parent = self.profiler.current_stages()
+            def run_fold(*args):
+                with self.profiler.within(parent):
+                    return self.run_fold(*args)
+
+            with ThreadPoolExecutor(max_workers=n_parallel) as executor:
+                futures = [
+                    executor.submit(run_fold, fold, train_index, test_index, df, X, y, n_jobs)
+                    for fold, (train_index, test_index) in folds
+                ]
+                # Collect in fold order
+                all_fold_results = [future.result() for future in futures]
 
-            fold_dir = self.results_manager.create_subdir(f"fold_{fold}")
+        self.summarize_cross_validation_results(all_fold_results)
 
-            X_train, X_test = X.iloc[train_index], X.iloc[test_index]
-            y_train, y_test = y.iloc[train_index], y.iloc[test_index]
-            df_train = df.iloc[train_index]
-            df_test = df.iloc[test_index]
+    def fold_indices(self, truth: pd.Categorical):
+        """Numbered (train_index, test_index) pairs of the cross-validation folds.
+
+        Each dataset's events are dealt evenly into the folds by a permutation seeded with the
+        dataset's file and event selection, so the folds are stratified by process and an event
+        falls in the same fold in every config that reads its dataset the same way.
+        """
+        truth = pd.Categorical(truth)
+        codes = np.asarray(truth.codes)
+        assignment = np.empty(len(codes), dtype=np.int64)
+        for code, key in enumerate(truth.categories):
+            rows = np.flatnonzero(codes == code)
+            events = json.dumps(
+                dataset_events(self.config, self.path_dict, key), default=str
+            ).encode()
+            seed = int.from_bytes(hashlib.sha256(events).digest()[:8], 'little')
+            rng = np.random.default_rng([seed, self.preprocessor.random_state])
+            # Start the remainder at a random fold, so the extra events spread over the folds
+            assignment[rows] = (
+                rng.permutation(len(rows)) + rng.integers(self.n_folds)
+            ) % self.n_folds
+
+        return [
+            (fold, (np.flatnonzero(assignment != fold - 1), np.flatnonzero(assignment == fold - 1)))
+            for fold in range(1, self.n_folds + 1)
+        ]
+
+    def fold_layout(self) -> dict:
+        """Everything that decides which events each fold tests on."""
+        return {
+            'cross_validation': self.use_cross_validation,
+            'n_folds': self.n_folds,
+            'test_size': self.preprocessor.test_size,
+            'random_state': self.preprocessor.random_state,
+            'datasets': {key: dataset_events(self.config, self.path_dict, key)
+                         for key in dict.fromkeys(constants.DATA_KEYS)},
+        }
 
-            X_train, X_test, y_train, y_test, df_train, df_test = self.preprocessor.prepare_fold_data(X_train, X_test, y_train, y_test, df_train, df_test)
+    def warm_start_conflict(self, previous: dict) -> str | None:
+        """Why models trained with a previous fold layout may have seen this config's test events.
+
+        None when they cannot have.
+        """
+        layout = self.fold_layout()
+        settings = ('cross_validation', 'n_folds', 'test_size', 'random_state')
+        if any(layout[setting] != previous[setting] for setting in settings):
+            return "the folds are set up differently"
+
+        if not self.use_cross_validation:
+            # The single split shuffles all events together, so it only repeats on the same datasets
+            if layout['datasets'] != previous['datasets']:
+                return "the datasets differ and the train/test split depends on all of them"
+            return None
+
+        # Folds are dealt per dataset, so only files read with another event selection are a problem
+        previous_events = {events[0]: events for events in previous['datasets'].values()}
+        for key, events in layout['datasets'].items():
+            if previous_events.get(events[0], events) != events:
+                return f"{key} reads {events[0]} with a different event selection"
+        return None
+
+    def run_fold(self, fold, train_index, test_index, df, X, y, n_jobs=None):
+        with self.profiler.stage('fold', fold=fold):
+            return self._run_fold(fold, train_index, test_index, df, X, y, n_jobs)
+
+    def _run_fold(self, fold, train_index, test_index, df, X, y, n_jobs=None):
+        self.logger.info(f"Processing fold {fold}")
+        start = time.perf_counter()
+
+        fold_dir = self.results_manager.create_subdir(f"fold_{fold}")
+
+        # Each fold fits its own scaler and models, so folds can run concurrently
+        preprocessor = copy.deepcopy(self.preprocessor)
+
+        with self.profiler.stage('preprocess'):
+            if self.compact:
+                X_train, X_test, y_train, y_test = preprocessor.prepare_matrix_data(
+                    df, train_index, test_index
+                )
+                truth_test = df.truth(test_index)
+            else:
+                X_train, X_test = X.iloc[train_index], X.iloc[test_index]
+                y_train, y_test = y.iloc[train_index], y.iloc[test_index]
+                df_train = df.iloc[train_index]
+                df_test = df.iloc[test_index]
+
+                X_train, X_test, y_train, y_test, df_train, df_test = (
+                    preprocessor.prepare_fold_data(
+                        X_train, X_test, y_train, y_test, df_train, df_test
+                    )
+                )
+                truth_test = df_test['Truth']
+
+        models = self.create_models(n_jobs)
+        self.warm_start(models, fold, X_train.shape[1])
+        results = self.train_and_evaluate_models(
+            X_train,
+            X_test,
+            y_train,
+            y_test,
+            truth_test,
+            models,
+            sample_weight=preprocessor.sample_weights(y_train),
+        )
+        self.record_trained_models(models, fold)
+        self.save_fold_models(fold, models, preprocessor.scaler, fold_dir)
 
-            results = self.train_and_evaluate_models(X_train, X_test, y_train, y_test, df_test)
+        if self.compact:
+            df_test = df.to_dataframe(test_index)
 
+        with self.profiler.stage('visualize'):
             self.visualize_results(results, df_test, fold_dir)
+        with self.profiler.stage('save'):
             self.save_results(results, df_test, fold_dir)
 
-            all_fold_results.append(results)
+        self.logger.info(f"Fold {fold} finished in {time.perf_counter() - start:.1f}s")
+        return results
 
-        self.summarize_cross_validation_results(all_fold_results)
+    def load_data(self, keys=None):
+        if keys is not None and len(keys) == 0:
+            return {}
 
-    def load_data(self):
         self.logger.info("Loading data...")
-        return self.data_loader.load_data(self.config.get('data.mass_cut'))
+        if self.shared_data is None:
+            data = self.data_loader.load_data(self.config.get('data.mass_cut'), keys)
+            self.log_read_timings()
+            return data
+
+        if keys is None:
+            keys = list(dict.fromkeys(constants.DATA_KEYS))
+
+        shared_keys = {key: dataset_key(self.config, self.path_dict, key) for key in keys}
+        missing = [key for key in keys if shared_keys[key] not in self.shared_data]
+        self.logger.info(
+            "Reusing %d of %d datasets loaded by previous configs",
+            len(keys) - len(missing),
+            len(keys),
+        )
+        self.shared_data.count_reuse(shared_keys[key] for key in keys if key not in missing)
+
+        if missing:
+            start = time.perf_counter()
+            loaded = self.data_loader.load_data(self.config.get('data.mass_cut'), missing)
+            self.log_read_timings()
+            self.shared_data.add(
+                {shared_keys[key]: arr for key, arr in loaded.items()}, time.perf_counter() - start
+            )
+
+        return {key: self.shared_data.get(shared_keys[key]) for key in keys}
+
+    def log_read_timings(self):
+        for timing in self.data_loader.read_timings:
+            self.logger.info(
+                "Read %s [%s, %s): %d events in %.2fs",
+                timing['dataset'],
+                timing['entry_start'],
+                timing['entry_stop'],
+                timing['n_events'],
+                timing['read_s'],
+            )
+
+    def feature_cache_key(self, key):
+        if self.feature_cache is None:
+            return None
+
+        # The Suu mass cut is only applied to signal datasets
+        mass_cut = self.config.get('data.mass_cut') if key.startswith('SIG') else None
+        return self.feature_cache.key(
+            self.path_dict[key],
+            index_start=self.data_loader.index_start,
+            index_stop=self.data_loader.index_stop,
+            mass_cut=mass_cut,
+            **self.feature_extractor.parameters(),
+        )
+
+    def load_cached_features(self):
+        if self.feature_cache is None:
+            return {}
+
+        features = {}
+        keys = list(dict.fromkeys(constants.DATA_KEYS))
+        for key in keys:
+            cached = self.feature_cache.get(self.feature_cache_key(key))
+            if cached is not None:
+                features[key] = cached
+
+        self.logger.info("Found cached features for %d of %d datasets", len(features), len(keys))
+        return features
 
     def extract_features(self, data):
+        if not data:
+            return {}
+
         self.logger.info("Extracting features...")
 
-        features = thread_map(
-            self.feature_extractor.compute_all,
-            data.values(),
-            max_workers=32,
-            desc="Extracting features"
+        features = self.feature_executor.extract(data)
+        self.check_features(features)
+        self.store_cached_features(features)
+
+        return features
+
+    def read_and_extract_features(self, keys):
+        if not keys:
+            return {}
+
+        self.logger.info("Reading data and extracting features (%s backend, step size %s)...",
+                         self.feature_executor.backend, self.data_loader.step_size)
+        features = self.feature_executor.run(keys, self.config.get('data.mass_cut'))
+
+        self.check_features(features)
+        self.store_cached_features(features)
+
+        return features
+
+    def check_features(self, features):
+        n_features = len(next(iter(features.values())).keys())
+        self.logger.info("Working with %d feature columns", n_features)
+
+        assert n_features == len(
+            self.feature_extractor.feature_names
+        ), (
+            f"Number of extracted features ({n_features}) doesn't match number of feature names "
+            f"defined on feature extractor object ({len(self.feature_extractor.feature_names)})"
         )
 
-        self.logger.info("Working with %d feature columns", len(features[0].keys()))
+    def save_feature_timings(self):
+        if not self.feature_executor.timings:
+            return
+
+        for timing in self.feature_executor.timings:
+            self.logger.info(
+                "%s [%s, %s): %d events, read %.2fs, extract %.2fs (%s)",
+                timing['dataset'],
+                timing.get('entry_start'),
+                timing.get('entry_stop'),
+                timing['n_events'],
+                timing['read_s'],
+                timing['extract_s'],
+                timing['worker'],
+            )
+
+        worker_summary = self.feature_executor.worker_summary()
+        for worker, summary in worker_summary.items():
+            self.logger.info(
+                "Worker %s: %d datasets, %d events, busy %.2fs",
+                worker,
+                summary['datasets'],
+                summary['n_events'],
+                summary['total_s'],
+            )
+
+        group_summary = self.feature_executor.group_summary()
+        for group, seconds in sorted(group_summary.items(), key=lambda item: -item[1]):
+            self.logger.info("Feature group %s: %.2fs", group, seconds)
+
+        read_summary = self.data_loader.read_summary()
+        for filename, summary in read_summary.items():
+            self.logger.info(
+                "Read %.1f MB of %s in %.2fs (%s MB/s)",
+                summary['mb'],
+                filename,
+                summary['seconds'],
+                f"{summary['mb_per_s']:.1f}" if summary['mb_per_s'] is not None else "n/a",
+            )
+
+        self.results_manager.save_json({
+            'backend': self.feature_executor.backend,
+            'max_workers': self.feature_executor.max_workers,
+            'datasets': self.feature_executor.timings,
+            'workers': worker_summary,
+            'groups': group_summary,
+            'reads': read_summary,
+        }, "feature_extraction_timings.json")
+
+    def save_timings(self):
+        """Write the recorded stage timings and peak memory of this run to timings.json."""
+        if not self.profiler.enabled:
+            return
+
+        self.results_manager.save_json({
+            'config': str(self.config.config_path),
+            **self.profiler.to_dict(),
+            'feature_groups': self.feature_executor.group_summary(),
+        }, "timings.json")
+
+    def store_cached_features(self, features):
+        if self.feature_cache is None:
+            return
+
+        for key, feature_dict in features.items():
+            self.feature_cache.put(self.feature_cache_key(key), feature_dict)
+
+    def warm_start(self, models, fold, n_features):
+        """Continue training from the previous sweep config's model of each fold, if supported."""
+        for model_name, model in models.items():
+            previous = self.warm_start_models.get(fold, {}).get(model_name)
+            if model is None or previous is None:
+                continue
+
+            if previous.input_shape != n_features:
+                self.logger.warning(
+                    f"Not warm-starting {model_name} in fold {fold}: previous model has "
+                    f"{previous.input_shape} features, not {n_features}"
+                )
+                continue
+
+            self.logger.info(f"Warm-starting {model_name} in fold {fold} from the previous config")
+            model.warm_start(previous)
 
-        assert len(features[0].keys()) == len(self.feature_extractor.feature_names), \
-            f"Number of extracted features ({len(features[0].keys())}) doesn't match number of feature names defined on feature extractor object ({len(self.feature_extractor.feature_names)})"
+    def record_trained_models(self, models, fold):
+        # Only models that can be warm-started are worth keeping for the next config
+        self.trained_models[fold] = {
+            model_name: model
+            for model_name, model in models.items()
+            if hasattr(model, 'warm_start')
+        }
 
-        return dict(zip(data.keys(), features))
+    def save_fold_models(self, fold, models, scaler, fold_dir=None):
+        """Save a fold's trained models and fitted scaler for prediction-only evaluation."""
+        if not self.persist_models:
+            return
+
+        results_dir = self.results_manager.results_dir
+        fold_dir = Path(fold_dir) if fold_dir else results_dir
+
+        entry = {
+            'directory': os.path.relpath(fold_dir, results_dir),
+            'scaler': 'scaler.joblib',
+            'models': {},
+        }
+        joblib.dump(scaler, fold_dir / entry['scaler'])
+        for model_name, model in models.items():
+            if model is None:
+                continue
+            filename = f"{model_name}{model.model_file_suffix}"
+            model.save(str(fold_dir / filename))
+            entry['models'][model_name] = filename
+
+        self.saved_models[fold] = entry
+
+    def save_model_manifest(self):
+        if not self.persist_models:
+            return
+
+        self.results_manager.save_json({
+            'feature_names': self.feature_extractor.feature_names,
+            'cross_validation': self.use_cross_validation,
+            'folds': {str(fold): self.saved_models[fold] for fold in sorted(self.saved_models)},
+        }, "models_manifest.json")
+
+    def evaluate_only(self):
+        """Recompute metrics, plots and counts from the saved models and test sets, not training."""
+        self.logger.info("Evaluating saved models...")
+        start = time.perf_counter()
+
+        manifest = self.results_manager.load_json("models_manifest.json")
+        feature_names = manifest['feature_names']
+
+        all_fold_results = []
+        for fold, entry in manifest['folds'].items():
+            fold_dir = self.results_manager.results_dir / entry['directory']
+            df_test = pd.read_parquet(fold_dir / "test_set.parquet")
+
+            scale, models = self.load_fold_models(entry, feature_names)
+            X_test = scale(df_test[feature_names].to_numpy())
+
+            results = {}
+            for model_name, model in models.items():
+                trained = {'predictions': model.predict(X_test)}
+                if hasattr(model, 'feature_importances'):
+                    trained['feature_importances'] = model.feature_importances()
+                results[model_name] = self.evaluate_predictions(trained, df_test['Truth'])
+
+            custom_dir = fold_dir if entry['directory'] != '.' else None
+            self.visualize_results(results, df_test, custom_dir)
+            self.save_results(results, df_test, custom_dir)
+            all_fold_results.append(results)
+
+        if manifest['cross_validation']:
+            self.summarize_cross_validation_results(all_fold_results)
+
+        self.logger.info(
+            f"Evaluation of saved models finished in {time.perf_counter() - start:.1f}s"
+        )
+
+    def load_fold_models(self, entry, feature_names):
+        """Load a fold's saved scaler and the saved models that are still configured."""
+        fold_dir = self.results_manager.results_dir / entry['directory']
+
+        scaler = joblib.load(fold_dir / entry['scaler'])
+        def scale(X):
+            # Scalers fitted on DataFrames expect their column names back
+            return scaler.transform(
+                pd.DataFrame(X, columns=feature_names)
+                if hasattr(scaler, 'feature_names_in_')
+                else X
+            )
+
+        configured = self.create_models()
+        models = {}
+        for model_name, filename in entry['models'].items():
+            model = configured.get(model_name)
+            if model is None:
+                self.logger.warning(f"Skipping saved {model_name} in {fold_dir}: not configured")
+                continue
+
+            model.build(len(feature_names))
+            model.load(str(fold_dir / filename))
+            models[model_name] = model
+
+        return scale, models
+
+    def score_dataset(self, key, output_path, model_name, fold=None, max_workers=4):
+        """Score a dataset's events with a saved model, streaming them chunk by chunk.
+
+        Only the events the config selects are scored: those in [data.index_start, data.index_stop)
+        and, for signal datasets, passing data.mass_cut.
+        """
+        manifest = self.results_manager.load_json("models_manifest.json")
+        fold = str(fold) if fold is not None else next(iter(manifest['folds']))
+
+        scale, models = self.load_fold_models(manifest['folds'][fold], manifest['feature_names'])
+        if model_name not in models:
+            raise ValueError(f"No saved {model_name} model in fold {fold}")
+
+        self.logger.info(f"Scoring {key} with {model_name} from fold {fold} into {output_path}...")
+        start = time.perf_counter()
+
+        batches = stream_feature_batches(
+            self.data_loader, self.feature_extractor, key, self.config.get('data.mass_cut'), scale
+        )
+        models[model_name].predict_batched(batches, output_path, max_workers=max_workers)
+
+        self.logger.info(f"Scoring {key} finished in {time.perf_counter() - start:.1f}s")
 
     def preprocess_data(self, features):
         self.logger.info("Preprocessing data...")
         return self.preprocessor.prepare_data(features)
 
-    def train_and_evaluate_models(self, X_train, X_test, y_train, y_test, df_test):
+    def train_and_evaluate_models(
+        self, X_train, X_test, y_train, y_test, truth_test, models=None, sample_weight=None
+    ):
+        if models is None:
+            models = self.models
+
         results = {}
-        for model_name, model in self.models.items():
+        for model_name, model in models.items():
             if model is None:
                 continue
-            self.logger.info(f"Training and evaluating {model_name}...")
+            trained = self.train_model(
+                model_name, model, X_train, X_test, y_train, y_test, sample_weight
+            )
+            with self.profiler.stage(f'evaluate:{model_name}'):
+                results[model_name] = self.evaluate_predictions(trained, truth_test)
+        return results
+
+    def train_model(self, model_name, model, X_train, X_test, y_train, y_test, sample_weight=None):
+        """Train one model and score the test set."""
+        self.logger.info(f"Training and evaluating {model_name}...")
+        with self.profiler.stage(f'train:{model_name}', n_events=len(X_train)):
             model.build(X_train.shape[1])
-            model.train(X_train, y_train, X_test, y_test)
-            y_pred = model.predict(X_test)
+            model.train(X_train, y_train, X_test, y_test, sample_weight=sample_weight)
 
-            sample_weights = np.array([self.cross_sections[label] for label in df_test['Truth']])
+        with self.profiler.stage(f'predict:{model_name}', n_events=len(X_test)):
+            trained = {'predictions': model.predict(X_test)}
+        if hasattr(model, 'feature_importances'):
+            trained['feature_importances'] = model.feature_importances()
+        return trained
 
-            thresholds = self.config.get('evaluation.thresholds', [0.2, 0.5, 0.8, 0.90, 0.925, 0.95, 0.96, 0.97, 0.98, 0.99])
-            use_real_event_percentiles = self.config.get('evaluation.use_real_event_percentiles', False)
-            total_luminosity = self.config.get('data.total_luminosity', 3000)
+    def evaluate_predictions(self, trained, truth_test):
+        """Compute the metrics and counts of a trained model's test set scores."""
+        y_pred = trained['predictions']
 
-            metrics = calculate_metrics(y_test, y_pred, sample_weights, thresholds, use_real_event_percentiles)
-            sig_bkg_metrics = calculate_signal_background_metrics(y_test, y_pred, thresholds, sample_weights, total_luminosity, self.cross_sections, use_real_event_percentiles)
+        # Sort the scores once for all metrics and plots
+        distribution = ScoreDistribution(y_pred, truth_test, self.cross_sections)
 
-            cuts = thresholds
-            df_counts = calculate_counts_for_score_cuts(y_test, y_pred, df_test['combined_invariant_mass'], df_test['Truth'], self.cross_sections, total_luminosity, cuts, use_real_event_percentiles)
+        thresholds = self.config.get(
+            'evaluation.thresholds', [0.2, 0.5, 0.8, 0.90, 0.925, 0.95, 0.96, 0.97, 0.98, 0.99]
+        )
+        use_real_event_percentiles = self.config.get('evaluation.use_real_event_percentiles', False)
+        total_luminosity = self.config.get('data.total_luminosity', 3000)
+
+        metrics = calculate_metrics(distribution, thresholds, use_real_event_percentiles)
+        sig_bkg_metrics = calculate_signal_background_metrics(
+            distribution, thresholds, use_real_event_percentiles
+        )
 
-            results[model_name] = {
-                'metrics': metrics,
-                'sig_bkg_metrics': sig_bkg_metrics,
-                'predictions': y_pred,
-                'counts': df_counts
-            }
-            if hasattr(model, 'feature_importances'):
-                results[model_name]['feature_importances'] = model.feature_importances()
+        cuts = thresholds
+        df_counts = calculate_counts_for_score_cuts(
+            distribution, total_luminosity, cuts, use_real_event_percentiles
+        )
+
+        results = {
+            'metrics': metrics,
+            'sig_bkg_metrics': sig_bkg_metrics,
+            'predictions': y_pred,
+            'distribution': distribution,
+            'counts': df_counts
+        }
+        if 'feature_importances' in trained:
+            results['feature_importances'] = trained['feature_importances']
         return results
 
     def visualize_results(self, results, df_test, custom_dir=None):
@@ -248,15 +869,169 @@ class Analysis:
 
         return f"{mean_formatted} ± {std_formatted}"
 
+
+class SharedDatasets:
+    """Loaded datasets kept in memory across the configs of a sweep, by file and event selection."""
+
+    def __init__(self):
+        self.arrays = {}
+        self.load_seconds = {}
+        self.reused_seconds = 0.0
+
+    def __contains__(self, key):
+        return key in self.arrays
+
+    def add(self, arrays, seconds):
+        for key, arr in arrays.items():
+            self.arrays[key] = arr
+            self.load_seconds[key] = seconds / len(arrays)
+
+    def get(self, key):
+        return self.arrays[key]
+
+    def count_reuse(self, keys):
+        """Add up the loading time saved by reusing these datasets."""
+        self.reused_seconds += sum(self.load_seconds[key] for key in keys)
+
+    def retain(self, keys):
+        """Drop the datasets that no remaining config reads."""
+        for key in list(self.arrays):
+            if key not in keys:
+                del self.arrays[key]
+
+
+class Sweep:
+    """Runs a list of configs in one process.
+
+    Datasets loaded by one config are kept for later configs that read the
+    same files with the same event selection. With warm_start, boosted models
+    continue from the previous config's model of the same fold, which suits
+    sweeps over neighbouring mass points, unless that model may have trained
+    on events the fold now tests on.
+    """
+
+    def __init__(self, config_paths: list[str], warm_start: bool = False):
+        self.config_paths = config_paths
+        self.warm_start = warm_start
+
+        self.logger = create_sweep_logger(ConfigManager(config_paths[0]))
+
+        # Datasets each config would load, to know when they can be dropped
+        self.dataset_keys = []
+        for config_path in config_paths:
+            config = ConfigManager(config_path)
+            path_dict = getattr(constants, config.get('data.path_dict'))
+            self.dataset_keys.append(
+                {dataset_key(config, path_dict, key) for key in dict.fromkeys(constants.DATA_KEYS)}
+            )
+
+    def run(self):
+        shared_data = SharedDatasets()
+        warm_start_models = {}
+        fold_layout = None
+        config_timings = []
+
+        start = time.perf_counter()
+        for i, config_path in enumerate(self.config_paths):
+            shared_data.retain(set().union(*self.dataset_keys[i:]))
+
+            analysis = Analysis(config_path)
+            analysis.shared_data = shared_data
+            if self.warm_start and fold_layout is not None:
+                # Continuing from models trained on this config's test events would bias its metrics
+                conflict = analysis.warm_start_conflict(fold_layout)
+                if conflict is None:
+                    analysis.warm_start_models = warm_start_models
+                else:
+                    analysis.logger.warning(
+                        f"Not warm-starting from the previous config: {conflict}"
+                    )
+
+            config_start = time.perf_counter()
+            analysis.run()
+            config_timings.append(
+                {'config': config_path, 'seconds': time.perf_counter() - config_start}
+            )
+
+            warm_start_models = analysis.trained_models
+            fold_layout = analysis.fold_layout()
+        total = time.perf_counter() - start
+
+        return self.report(config_timings, total, shared_data.reused_seconds)
+
+    def process_startup_seconds(self) -> float | None:
+        """Time the interpreter start-up and imports that every separate process pays again."""
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", "import diquark.analysis"],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            # The report is still worth keeping, only without the start-up in the baseline
+            self.logger.warning(
+                f"Could not time the process start-up, leaving it out of the baseline: "
+                f"{result.stderr.strip()}"
+            )
+            return None
+        return time.perf_counter() - start
+
+    def report(self, config_timings, total, reused_seconds):
+        """Compare the sweep against running each config in a fresh process."""
+        startup = self.process_startup_seconds()
+
+        # Warm-started training is counted at its sweep duration, which underestimates the baseline
+        baseline = (sum(timing['seconds'] for timing in config_timings)
+                    + len(config_timings) * (startup or 0.0) + reused_seconds)
+
+        for timing in config_timings:
+            self.logger.info(f"{timing['config']}: {timing['seconds']:.1f}s")
+        self.logger.info(
+            f"Sweep of {len(config_timings)} configs took {total:.1f}s, "
+            f"estimated {baseline:.1f}s as separate processes ({baseline / total:.2f}x)"
+        )
+
+        return {
+            'configs': config_timings,
+            'total_seconds': total,
+            'process_startup_seconds': startup,
+            'reused_load_seconds': reused_seconds,
+            'estimated_baseline_seconds': baseline,
+            'warm_start': self.warm_start,
+        }
+
+
 if __name__ == "__main__":
     random.seed(17)
     np.random.seed(17)
 
     parser = argparse.ArgumentParser(description="Run diquark analysis with optional custom config file.")
-    parser.add_argument("-c", "--config", type=str, default='diquark/config/default_settings.yaml',
-                        help="Path to the configuration file (default: diquark/config/default_settings.yaml)")
+    parser.add_argument(
+        "-c",
+        "--config",
+        type=str,
+        nargs='+',
+        default=['diquark/config/default_settings.yaml'],
+        help="Path to the configuration file, or several to run them as a sweep in one process "
+        "(default: diquark/config/default_settings.yaml)",
+    )
+    parser.add_argument(
+        "--evaluate-only",
+        action="store_true",
+        help="Reload the saved models and test sets and only recompute metrics and plots",
+    )
+    parser.add_argument("--warm-start", action="store_true",
+                        help="In a sweep, continue boosting from the previous config's models")
+    parser.add_argument("--sweep-report", type=str, default=None,
+                        help="Write the sweep timing report to this JSON file")
 
     args = parser.parse_args()
 
-    analysis = Analysis(args.config)
-    analysis.run()
+    if args.evaluate_only:
+        for config_path in args.config:
+            Analysis(config_path).evaluate_only()
+    elif len(args.config) == 1:
+        analysis = Analysis(args.config[0])
+        analysis.run()
+    else:
+        report = Sweep(args.config, warm_start=args.warm_start).run()
+        if args.sweep_report:
+            with open(args.sweep_report, 'w') as f:
+                json.dump(report, f, indent=2)
@@ -0,0 +1,116 @@
+import argparse
+import json
+import random
+
+import numpy as np
+
+from diquark.analysis import Analysis, Sweep
+from diquark.stages import StagedSweep
+
+
+def sweep(args):
+    if args.warm_start:
+        # Warm starts chain the configs, so they run one after another
+        runner = Sweep(args.configs, warm_start=True)
+        runner.logger.warning(
+            "--warm-start runs the configs one after another without stage deduplication "
+            "or -j: only datasets shared between configs are loaded once"
+        )
+        report = runner.run()
+    else:
+        report = StagedSweep(args.configs, max_workers=args.workers).run()
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+def score(args):
+    Analysis(args.config).score_dataset(
+        args.dataset, args.output, args.model, fold=args.fold, max_workers=args.workers
+    )
+
+
+def skim(args):
+    analysis = Analysis(args.config)
+    if analysis.data_loader.skims is None:
+        raise SystemExit(f"{args.config} sets no data.skim_dir to write the skims to")
+
+    manifests = analysis.data_loader.skim_data(
+        args.datasets, force=args.force, max_workers=args.workers
+    )
+    for key, manifest in manifests.items():
+        status = "up to date" if manifest["skipped"] else f"written in {manifest['seconds']:.1f}s"
+        print(
+            f"{key}: {manifest['n_entries']} events, {manifest['bytes'] / 1024**2:.1f} MB, {status}"
+        )
+
+
+def main(argv=None):
+    random.seed(17)
+    np.random.seed(17)
+
+    parser = argparse.ArgumentParser(prog="diquark", description="Diquark analysis tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sweep_parser = subparsers.add_parser(
+        "sweep", help="Run many configs, executing each distinct pipeline stage once"
+    )
+    sweep_parser.add_argument("configs", nargs='+', help="Paths to the configuration files")
+    sweep_parser.add_argument("-j", "--workers", type=int, default=4,
+                              help="Number of configs processed concurrently (default: 4)")
+    sweep_parser.add_argument(
+        "--warm-start",
+        action="store_true",
+        help="Run the configs in order, continuing boosting from the previous config's models "
+        "(without stage deduplication)",
+    )
+    sweep_parser.add_argument("--report", type=str, default=None,
+                              help="Write the per-stage timing report to this JSON file")
+    sweep_parser.set_defaults(func=sweep)
+
+    score_parser = subparsers.add_parser(
+        "score", help="Score a dataset's selected events with a saved model, in bounded memory"
+    )
+    score_parser.add_argument("-c", "--config", type=str, required=True,
+                              help="Configuration whose results directory holds the saved models")
+    score_parser.add_argument(
+        "-d", "--dataset", type=str, required=True, help="Dataset key in the config's path_dict"
+    )
+    score_parser.add_argument(
+        "-o", "--output", type=str, required=True, help="Output .npy or .parquet file"
+    )
+    score_parser.add_argument("-m", "--model", type=str, default='gradient_boosting',
+                              help="Saved model to use (default: gradient_boosting)")
+    score_parser.add_argument(
+        "--fold", type=int, default=None, help="Fold whose model to use (default: the first)"
+    )
+    score_parser.add_argument("-j", "--workers", type=int, default=4,
+                              help="Number of batches scored concurrently (default: 4)")
+    score_parser.set_defaults(func=score)
+
+    skim_parser = subparsers.add_parser(
+        "skim", help="Copy the jet branches of a config's datasets to compact Parquet skims"
+    )
+    skim_parser.add_argument(
+        "-c",
+        "--config",
+        type=str,
+        required=True,
+        help="Configuration whose path_dict datasets to skim into its data.skim_dir",
+    )
+    skim_parser.add_argument("-d", "--datasets", nargs='+', default=None,
+                             help="Dataset keys to skim (default: all)")
+    skim_parser.add_argument(
+        "-f", "--force", action="store_true", help="Rewrite skims that are already up to date"
+    )
+    skim_parser.add_argument("-j", "--workers", type=int, default=8,
+                             help="Number of files skimmed concurrently (default: 8)")
+    skim_parser.set_defaults(func=skim)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+
+class FeatureMatrix:
+    """Features of all datasets in one contiguous matrix, with compact per-event labels.
+
+    Rows are events in dataset order, `target` is the signal flag and
+    `codes` index into `processes`. Subsets are selected with index arrays,
+    so only the rows that a model actually consumes are ever copied.
+    """
+
+    def __init__(self, X: np.ndarray, target: np.ndarray, codes: np.ndarray,
+                 processes: list[str], feature_names: list[str]):
+        self.X = X
+        self.target = target
+        self.codes = codes
+        self.processes = processes
+        self.feature_names = feature_names
+
+    @classmethod
+    def from_features(
+        cls, features: dict[str, dict[str, np.ndarray]], dtype=np.float32
+    ) -> "FeatureMatrix":
+        """Pack per-dataset feature columns into a preallocated matrix, one column at a time."""
+        processes = list(features.keys())
+        feature_names = list(next(iter(features.values())).keys())
+        lengths = [len(next(iter(feature_dict.values()))) for feature_dict in features.values()]
+        bounds = np.r_[0, np.cumsum(lengths)]
+
+        X = np.empty((bounds[-1], len(feature_names)), dtype=dtype)
+        for i, feature_dict in enumerate(features.values()):
+            for j, name in enumerate(feature_names):
+                X[bounds[i]:bounds[i + 1], j] = feature_dict[name]
+
+        codes = np.repeat(np.arange(len(processes), dtype=np.int16), lengths)
+        is_signal = np.array(['SIG' in process for process in processes])
+        target = is_signal[codes].astype(np.int8)
+
+        return cls(X, target, codes, processes, feature_names)
+
+    def __len__(self) -> int:
+        return len(self.X)
+
+    def truth(self, index: np.ndarray = None) -> pd.Categorical:
+        """Process label of the selected events."""
+        codes = self.codes if index is None else self.codes[index]
+        return pd.Categorical.from_codes(codes, categories=self.processes)
+
+    def to_dataframe(self, index: np.ndarray = None) -> pd.DataFrame:
+        """Materialize the selected events with the columns of Preprocessor.create_dataframe."""
+        X = self.X if index is None else self.X[index]
+        df = pd.DataFrame(X, columns=self.feature_names)
+        df['Truth'] = self.truth(index)
+        df['target'] = self.target if index is None else self.target[index]
+        return df
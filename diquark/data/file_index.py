@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+import uproot
+
+
+class FileIndex:
+    """Entry counts, compressed sizes and basket boundaries of the branches of ROOT files.
+
+    Reading them only needs the TTree metadata, not the baskets, so the
+    index is cheap to build; it is kept in a JSON file (when `path` is given)
+    and an entry is rebuilt once its file's size or modification time change.
+    """
+
+    def __init__(self, path: str = None, tree_name: str = "Delphes"):
+        self.path = Path(path) if path is not None else None
+        self.tree_name = tree_name
+        self._lock = threading.Lock()
+        self._files = self._load()
+
+    def __getstate__(self):
+        # The lock can't be pickled for the processes backend
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, OSError, json.JSONDecodeError):
+            return {}
+
+    def _save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self._files, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, filename: str, branches: list[str]) -> dict:
+        """The index entry of a file, covering at least the given branches, built if needed."""
+        stat = os.stat(filename)
+        name = str(Path(filename).resolve())
+
+        with self._lock:
+            entry = self._files.get(name)
+            if (
+                entry is not None
+                and entry["mtime_ns"] == stat.st_mtime_ns
+                and entry["size"] == stat.st_size
+                and all(branch in entry["branches"] for branch in branches)
+            ):
+                return entry
+
+        entry = self._index(filename, branches, stat)
+        with self._lock:
+            self._files[name] = entry
+            self._save()
+        return entry
+
+    def _index(self, filename: str, branches: list[str], stat: os.stat_result) -> dict:
+        with uproot.open(filename) as f:
+            tree = f[self.tree_name]
+            entry = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "entries": tree.num_entries,
+                "branches": {},
+            }
+            for name in branches:
+                branch = tree[name]
+                entry["branches"][name] = {
+                    "compressed_bytes": branch.compressed_bytes,
+                    "uncompressed_bytes": branch.uncompressed_bytes,
+                    # First entry of every basket, followed by the number of entries
+                    "basket_starts": [int(start) for start in branch.entry_offsets],
+                }
+        return entry
+
+    def entries(self, filename: str, branches: list[str]) -> int:
+        return self.get(filename, branches)["entries"]
+
+    def compressed_bytes(
+        self, filename: str, branches: list[str], entry_start: int = 0, entry_stop: int = None
+    ) -> int:
+        """Estimated compressed bytes of the branches in an entry range, assuming even entries."""
+        entry = self.get(filename, branches)
+        entry_stop = entry["entries"] if entry_stop is None else min(entry_stop, entry["entries"])
+        fraction = max(entry_stop - entry_start, 0) / max(entry["entries"], 1)
+        return int(
+            fraction * sum(entry["branches"][branch]["compressed_bytes"] for branch in branches)
+        )
+
+    def entry_ranges(
+        self,
+        filename: str,
+        branches: list[str],
+        entry_start: int = 0,
+        entry_stop: int = None,
+        max_bytes: int = 256 * 1024**2,
+    ) -> list[tuple[int, int]]:
+        """Split an entry range into about equal parts of at most max_bytes compressed bytes.
+
+        Parts start on basket boundaries of the heaviest branch, so no part
+        decompresses that branch's baskets of its neighbours. A range with no
+        entries in the file stays a single empty part, so every dataset keeps
+        one result to merge.
+        """
+        entry = self.get(filename, branches)
+        entry_stop = entry["entries"] if entry_stop is None else min(entry_stop, entry["entries"])
+        if entry_stop <= entry_start:
+            return [(entry_start, entry_start)]
+
+        n_parts = -(
+            -self.compressed_bytes(filename, branches, entry_start, entry_stop) // max_bytes
+        )
+        if n_parts <= 1:
+            return [(entry_start, entry_stop)]
+
+        heaviest = max(branches, key=lambda branch: entry["branches"][branch]["compressed_bytes"])
+        boundaries = np.asarray(entry["branches"][heaviest]["basket_starts"])
+        boundaries = boundaries[(boundaries > entry_start) & (boundaries < entry_stop)]
+
+        # Nearest basket boundary to each equal split point
+        targets = np.linspace(entry_start, entry_stop, n_parts + 1)[1:-1]
+        if len(boundaries) == 0:
+            return [(entry_start, entry_stop)]
+        cuts = np.unique(boundaries[np.abs(boundaries[None, :] - targets[:, None]).argmin(axis=1)])
+
+        starts = [entry_start, *cuts.tolist()]
+        stops = [*cuts.tolist(), entry_stop]
+        return list(zip(starts, stops))
@@ -1,66 +1,438 @@
 import functools
+import threading
+import time
+import warnings
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterator
 
+import numpy as np
 import uproot
 import awkward as ak
 
 from tqdm.contrib.concurrent import thread_map
 
 from diquark.config.constants import DATA_KEYS
+from diquark.data.file_index import FileIndex
+from diquark.data.skim import SkimStore
+
+JET_BRANCHES = [
+    "Jet",
+    "Jet/Jet.PT",
+    "Jet/Jet.Eta",
+    "Jet/Jet.Phi",
+]
+# Generator particles are the bulk of a Delphes file, and only needed for the Suu mass cut on signal
+PARTICLE_BRANCHES = [
+    "Particle/Particle.PID",
+    "Particle/Particle.Status",
+    "Particle/Particle.Mass",
+]
+SUU_PID = 9936661
+HARD_PROCESS_STATUS = 22
+# Skims store the Suu truth mass in place of the Particle branches it is computed from
+SUU_MASS = "Suu.Mass"
+
+
+def suu_truth_mass(arr: ak.Array) -> np.ndarray:
+    """Mass of each event's first hard-process Suu, -inf for events without one."""
+    is_suu = (arr["Particle/Particle.PID"] == SUU_PID) & (
+        arr["Particle/Particle.Status"] == HARD_PROCESS_STATUS
+    )
+    return ak.fill_none(ak.firsts(arr["Particle/Particle.Mass"][is_suu]), -np.inf).to_numpy()
+
+
+@functools.lru_cache(maxsize=None)
+def shared_executor(n_threads: int) -> ThreadPoolExecutor:
+    """One thread pool per size for uproot's decompression and interpretation, for all loaders."""
+    return ThreadPoolExecutor(max_workers=n_threads, thread_name_prefix="uproot")
+
+
+def compressed_bytes(
+    tree, branches: list[str], entry_start: int = None, entry_stop: int = None
+) -> int:
+    """Compressed bytes of the branches in an entry range, assuming evenly sized entries."""
+    entry_start = entry_start or 0
+    entry_stop = tree.num_entries if entry_stop is None else min(entry_stop, tree.num_entries)
+    fraction = max(entry_stop - entry_start, 0) / max(tree.num_entries, 1)
+    return int(fraction * sum(tree[branch].compressed_bytes for branch in branches))
+
+
+def merge_ranges(
+    keys: list[str], ranges: list[tuple[str, int, int]], results: list, combine: Callable
+) -> dict:
+    """Combine the results of each dataset's entry ranges, in entry order, into one per dataset.
+
+    The datasets are returned in key order.
+    """
+    parts = {key: [] for key in dict.fromkeys(keys)}
+    for (key, entry_start, _), result in zip(ranges, results):
+        parts[key].append((entry_start or 0, result))
+
+    return {key: combine([result for _, result in sorted(key_parts, key=lambda part: part[0])])
+            for key, key_parts in parts.items()}
+
+
+def concatenate_arrays(arrays: list[ak.Array]) -> ak.Array:
+    return arrays[0] if len(arrays) == 1 else ak.concatenate(arrays)
+
 
 class DataLoader:
 
-    def __init__(self, path_dict: dict[str, str], index_start=0, index_stop=None):
-        self.default_branches = [
-            "Jet",
-            "Jet/Jet.PT",
-            "Jet/Jet.Eta",
-            "Jet/Jet.Phi",
-            "Jet/Jet.BTag",
-            "Particle/Particle.PID",
-            "Particle/Particle.Status",
-            "Particle/Particle.Mass",
-        ]
+    def __init__(
+        self,
+        path_dict: dict[str, str],
+        index_start=0,
+        index_stop=None,
+        step_size=None,
+        branches: list[str] = None,
+        skim_dir: str = None,
+        file_index: FileIndex = None,
+        split_bytes: int = 256 * 1024**2,
+        executor: Executor = None,
+        max_concurrent_reads: int = None,
+    ):
+        # The jet branches the features read, see FeatureExtractor.branches
+        self.default_branches = branches if branches is not None else list(JET_BRANCHES)
         self.path_dict = path_dict
         self.index_start = index_start
         self.index_stop = index_stop
+        self.step_size = step_size
+        # Up-to-date skims written by `diquark skim` are read instead of the ROOT files
+        self.skims = SkimStore(skim_dir) if skim_dir is not None else None
+        # With a file index, files are read in basket-aligned entry ranges of at most split_bytes,
+        # largest first
+        self.file_index = file_index
+        self.split_bytes = split_bytes
+        self.read_timings: list[dict] = []
+        # uproot decompresses and interprets baskets on `executor` (serially without one); at most
+        # max_concurrent_reads reads, over all datasets and threads, run at once
+        self.executor = executor
+        self.read_slots = (
+            threading.BoundedSemaphore(max_concurrent_reads) if max_concurrent_reads else None
+        )
+        self.read_stats: dict[str, dict] = {}
+        self._stats_lock = threading.Lock()
+
+    def __copy__(self):
+        # Copies share the executor, the read budget and the read statistics
+        copied = object.__new__(DataLoader)
+        copied.__dict__.update(self.__dict__)
+        return copied
+
+    def __getstate__(self):
+        # Thread pools and locks can't be pickled; each worker process reads serially, unbudgeted
+        state = self.__dict__.copy()
+        state.update(executor=None, read_slots=None, read_stats={}, _stats_lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._stats_lock = threading.Lock()
+
+    @contextmanager
+    def reading(self):
+        """Hold one of the max_concurrent_reads read slots, if limited."""
+        if self.read_slots is None:
+            yield
+            return
+        with self.read_slots:
+            yield
+
+    def uproot_options(self) -> dict:
+        # Only for TTree.arrays and iterate: files shut down the executors they were opened with
+        # once closed
+        if self.executor is None:
+            return {}
+        return {"decompression_executor": self.executor, "interpretation_executor": self.executor}
+
+    def record_read(self, filename: str, n_bytes: int, seconds: float):
+        with self._stats_lock:
+            stats = self.read_stats.setdefault(str(filename), {"bytes": 0, "seconds": 0.0})
+            stats["bytes"] += n_bytes
+            stats["seconds"] += seconds
+
+    def read_summary(self) -> dict[str, dict]:
+        """Compressed MB read from each file, the seconds spent reading them and the MB/s achieved.
+
+        Ranges of a file read concurrently add up their seconds, so this is
+        the throughput of a single read. Skims are listed under their own
+        path, with their own bytes.
+        """
+        with self._stats_lock:
+            return {
+                filename: {
+                    "mb": stats["bytes"] / 1024**2,
+                    "seconds": stats["seconds"],
+                    "mb_per_s": (
+                        stats["bytes"] / 1024**2 / stats["seconds"]
+                        if stats["seconds"] > 0
+                        else None
+                    ),
+                }
+                for filename, stats in self.read_stats.items()
+            }
 
     def filter_fbits(self, branches: list[str]) -> list[str]:
         """Filter out branch names containing 'fBits'."""
         return [b for b in branches if "fBits" not in b]
 
-    def read_jet_delphes(self, filename: str, branches: list[str] = None) -> ak.Array:
-        """Read a delphes output TTree from a ROOT file into an awkward array."""
+    def branches_for(self, key: str, mass_cut: float = None) -> list[str]:
+        """Branches to read for a dataset, with the Particle branches when it gets the mass cut."""
+        if key.startswith("SIG") and mass_cut is not None:
+            return self.default_branches + PARTICLE_BRANCHES
+        return self.default_branches
+
+    def skim_columns(self, filename: str, branches: list[str]) -> list[str] | None:
+        """The skim columns holding the given branches, or None without an up-to-date skim."""
+        if self.skims is None:
+            return None
+
+        columns = [b for b in branches if b not in PARTICLE_BRANCHES]
+        if len(columns) < len(branches):
+            columns.append(SUU_MASS)
+        return columns if self.skims.is_fresh(filename, columns) else None
+
+    def plan(self, keys: list[str], mass_cut: float = None) -> list[tuple[str, int, int]]:
+        """The (key, entry_start, entry_stop) ranges to read the datasets in, largest first.
+
+        Without a file index, each dataset is a single range of
+        [index_start, index_stop), in the given order.
+        """
+        keys = list(dict.fromkeys(keys))
+        if self.file_index is None:
+            return [(key, self.index_start, self.index_stop) for key in keys]
+
+        ranges = []
+        for key in keys:
+            filename = self.path_dict[key]
+            branches = self.filter_fbits(self.branches_for(key, mass_cut))
+            entries = self.file_index.entries(filename, branches)
+            if self.index_stop is not None and self.index_stop > entries:
+                warnings.warn(
+                    f"{key}: index_stop {self.index_stop} exceeds the {entries} entries "
+                    f"of {filename}"
+                )
+
+            for entry_start, entry_stop in self.file_index.entry_ranges(
+                filename, branches, self.index_start or 0, self.index_stop, self.split_bytes
+            ):
+                size = self.file_index.compressed_bytes(filename, branches, entry_start, entry_stop)
+                ranges.append((size, key, entry_start, entry_stop))
+
+        ranges.sort(key=lambda entry_range: -entry_range[0])
+        return [(key, entry_start, entry_stop) for _, key, entry_start, entry_stop in ranges]
+
+    def read_jet_delphes(self, filename: str, branches: list[str] = None, entry_start: int = None,
+                         entry_stop: int = None) -> ak.Array:
+        """Read a delphes output TTree from a ROOT file (or its skim) into an awkward array.
+
+        The entries default to [index_start, index_stop).
+        """
         if branches is None:
             branches = self.default_branches
+        branches = self.filter_fbits(branches)
+        entry_start = self.index_start if entry_start is None else entry_start
+        entry_stop = self.index_stop if entry_stop is None else entry_stop
+
+        with self.reading():
+            start = time.perf_counter()
+            columns = self.skim_columns(filename, branches)
+            source = filename
+            if columns is not None:
+                # Skims are recorded under their own path, so ROOT and Parquet throughput stay apart
+                source = self.skims.path(filename)
+                arr = self.skims.read(filename, columns, entry_start, entry_stop)
+                n_bytes = self.skims.compressed_bytes(filename, entry_start, entry_stop)
+            else:
+                with uproot.open(filename) as f:
+                    tree = f["Delphes"]
+                    arr = tree.arrays(
+                        branches,
+                        library="ak",
+                        entry_start=entry_start,
+                        entry_stop=entry_stop,
+                        **self.uproot_options(),
+                    )
+                    n_bytes = compressed_bytes(tree, branches, entry_start, entry_stop)
+            self.record_read(source, n_bytes, time.perf_counter() - start)
 
+        return arr
+
+    def iterate_jet_delphes(
+        self,
+        filename: str,
+        branches: list[str] = None,
+        entry_start: int = None,
+        entry_stop: int = None,
+    ) -> Iterator[ak.Array]:
+        """Iterate over a delphes output TTree (or its skim) in chunks of step_size entries.
+
+        The step size can also be given in bytes, e.g. "100 MB".
+        """
+        if branches is None:
+            branches = self.default_branches
+        branches = self.filter_fbits(branches)
+        entry_start = self.index_start if entry_start is None else entry_start
+        entry_stop = self.index_stop if entry_stop is None else entry_stop
+
+        columns = self.skim_columns(filename, branches)
+        if columns is not None:
+            chunks = self.skims.iterate(filename, columns, entry_start, entry_stop, self.step_size)
+            n_bytes = self.skims.compressed_bytes(filename, entry_start, entry_stop)
+            yield from self._timed_chunks(self.skims.path(filename), chunks, n_bytes)
+            return
+
+        yield from self.iterate_root(filename, branches, self.step_size, entry_start, entry_stop)
+
+    def _timed_chunks(
+        self, filename: str, chunks: Iterator[ak.Array], n_bytes: int
+    ) -> Iterator[ak.Array]:
+        """Read each chunk within a read slot, timing the reads but not the chunks' consumers."""
+        seconds = 0.0
+        try:
+            while True:
+                with self.reading():
+                    start = time.perf_counter()
+                    arr = next(chunks, None)
+                    seconds += time.perf_counter() - start
+                if arr is None:
+                    return
+                yield arr
+        finally:
+            self.record_read(filename, n_bytes, seconds)
+
+    def iterate_root(self, filename: str, branches: list[str], step_size, entry_start=0,
+                     entry_stop=None) -> Iterator[ak.Array]:
         with uproot.open(filename) as f:
             tree = f["Delphes"]
-            branches = self.filter_fbits(branches)
-            return tree.arrays(branches, library="ak", entry_start=self.index_start, entry_stop=self.index_stop)
+            chunks = tree.iterate(
+                branches,
+                library="ak",
+                step_size=step_size,
+                entry_start=entry_start,
+                entry_stop=entry_stop,
+                **self.uproot_options(),
+            )
+            yield from self._timed_chunks(
+                filename, chunks, compressed_bytes(tree, branches, entry_start, entry_stop)
+            )
 
     def lower_cut_suu_mass(self, arr: ak.Array, mass: float) -> ak.Array:
-        """Filter out jets with mass less than the given value."""
-        mask = (arr["Particle/Particle.PID"] == 9936661) & (arr["Particle/Particle.Status"] == 22)
-        masses = arr["Particle/Particle.Mass"][mask].to_numpy()
-        print(f"Fraction of events passing mass cut: {(masses >= mass).sum() / len(masses):.2f}")
-        return arr[(masses > mass).flatten()]
+        """Keep events with a Suu heavier than the given mass, dropping the Particle branches."""
+        masses = arr[SUU_MASS].to_numpy() if SUU_MASS in arr.fields else suu_truth_mass(arr)
+        # Events without a hard-process Suu fail the cut
+        passing = masses > mass
+        print(f"Fraction of events passing mass cut: {passing.mean() if len(passing) else 0.0:.2f}")
+
+        jets = arr[
+            [field for field in arr.fields if field not in PARTICLE_BRANCHES and field != SUU_MASS]
+        ]
+        return jets[passing]
+
+    def skim_dataset(self, key: str, force: bool = False) -> tuple[str, dict]:
+        """Skim a file to its jet kinematics, and the Suu truth mass for signal, if outdated."""
+        filename = self.path_dict[key]
+        signal = key.startswith("SIG")
+        columns = JET_BRANCHES + ([SUU_MASS] if signal else [])
+        if not force and self.skims.is_fresh(filename, columns):
+            return key, {**self.skims.manifest(filename), "skipped": True}
 
-    def _load_dataset(self, key, mass_cut: float = None):
-        arr = self.read_jet_delphes(self.path_dict[key])
+        def chunks():
+            for arr in self.iterate_root(
+                filename, JET_BRANCHES + (PARTICLE_BRANCHES if signal else []), "100 MB"
+            ):
+                if signal:
+                    arr = ak.with_field(arr[JET_BRANCHES], suu_truth_mass(arr), SUU_MASS)
+                yield arr
+
+        start = time.perf_counter()
+        manifest = self.skims.write(filename, chunks())
+        return key, {**manifest, "seconds": time.perf_counter() - start, "skipped": False}
+
+    def skim_data(
+        self, keys: list[str] = None, force: bool = False, max_workers: int = 8
+    ) -> dict[str, dict]:
+        """Skim the given datasets, or all datasets in DATA_KEYS, returning each skim's manifest."""
+        if keys is None:
+            keys = DATA_KEYS
+
+        skim_dataset = functools.partial(self.skim_dataset, force=force)
+        results = thread_map(
+            skim_dataset, list(dict.fromkeys(keys)), max_workers=max_workers, desc="Skimming data"
+        )
+
+        return dict(results)
+
+    def load_dataset(
+        self, key, mass_cut: float = None, entry_start: int = None, entry_stop: int = None
+    ):
+        arr = self.read_jet_delphes(
+            self.path_dict[key], self.branches_for(key, mass_cut), entry_start, entry_stop
+        )
 
         if key.startswith("SIG") and mass_cut is not None:
             arr = self.lower_cut_suu_mass(arr, mass_cut)
 
         return key, arr
 
-    def load_data(self, mass_cut: float = None) -> dict[str, ak.Array]:
-        """Load all datasets specified in DATA_KEYS."""
+    def stream_dataset(
+        self,
+        key,
+        process: Callable[[ak.Array], dict[str, np.ndarray]],
+        mass_cut: float = None,
+        entry_start: int = None,
+        entry_stop: int = None,
+    ):
+        chunks = []
+        for arr in self.iterate_jet_delphes(self.path_dict[key], self.branches_for(key, mass_cut),
+                                            entry_start, entry_stop):
+            if key.startswith("SIG") and mass_cut is not None:
+                arr = self.lower_cut_suu_mass(arr, mass_cut)
 
-        # Load the datasets in parallel
-        load_dataset = functools.partial(self._load_dataset, mass_cut=mass_cut)
-        datasets = thread_map(load_dataset, DATA_KEYS, max_workers=64, desc="Loading data")
+            # Only the per-event columns of each chunk are kept
+            chunks.append(process(arr))
 
-        self.datasets = dict(datasets)
+        if not chunks:
+            # A range past the file's entries yields no chunks, so process its empty read for
+            # typed empty columns
+            chunks.append(process(self.load_dataset(key, mass_cut, entry_start, entry_stop)[1]))
 
-        return self.datasets
+        return key, {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+    def stream_data(
+        self,
+        process: Callable[[ak.Array], dict[str, np.ndarray]],
+        mass_cut: float = None,
+        keys: list[str] = None,
+        max_workers: int = 32,
+    ) -> dict[str, dict[str, np.ndarray]]:
+        """Stream the given datasets chunk by chunk through `process`, concatenating its columns."""
+        if keys is None:
+            keys = DATA_KEYS
 
+        stream_dataset = functools.partial(self.stream_dataset, process=process, mass_cut=mass_cut)
+        results = thread_map(stream_dataset, keys, max_workers=max_workers, desc="Streaming data")
+
+        return dict(results)
+
+    def load_data(self, mass_cut: float = None, keys: list[str] = None) -> dict[str, ak.Array]:
+        """Load the given datasets, or all datasets specified in DATA_KEYS."""
+        if keys is None:
+            keys = DATA_KEYS
+
+        def load_range(entry_range: tuple[str, int, int]) -> tuple[ak.Array, dict]:
+            key, entry_start, entry_stop = entry_range
+            start = time.perf_counter()
+            _, arr = self.load_dataset(key, mass_cut, entry_start, entry_stop)
+            return arr, {"dataset": key, "entry_start": entry_start, "entry_stop": entry_stop,
+                         "n_events": len(arr), "read_s": time.perf_counter() - start}
+
+        # Load the datasets in parallel, the largest ranges first
+        ranges = self.plan(keys, mass_cut)
+        results = thread_map(load_range, ranges, max_workers=64, desc="Loading data")
+        self.read_timings = [timing for _, timing in results]
+
+        self.datasets = merge_ranges(keys, ranges, [arr for arr, _ in results], concatenate_arrays)
+
+        return self.datasets
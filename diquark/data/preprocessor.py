@@ -6,6 +6,8 @@ from sklearn.preprocessing import StandardScaler, MinMaxScaler
 from sklearn.model_selection import train_test_split
 from typing import Dict, List, Tuple, Any
 
+from diquark.data.feature_matrix import FeatureMatrix
+
 class Preprocessor:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
@@ -13,26 +15,38 @@ class Preprocessor:
         self.test_size = config.get('test_size', 0.2)
         self.random_state = config.get('random_state', 42)
         self.oversample_signal = config.get('oversample_signal', True)
+        self.oversampling = config.get('oversampling', 'indices')
+        self.compact = config.get('compact', False)
 
+        # Compact mode scales freshly gathered rows, so the scaler can work in place
         if self.scaler_type == 'standard':
-            self.scaler = StandardScaler()
+            self.scaler = StandardScaler(copy=not self.compact)
         elif self.scaler_type == 'minmax':
-            self.scaler = MinMaxScaler()
+            self.scaler = MinMaxScaler(copy=not self.compact)
         else:
             raise ValueError(f"Unknown scaler type: {self.scaler_type}")
 
+        if self.oversampling not in ('indices', 'weights'):
+            raise ValueError(f"Unknown oversampling method: {self.oversampling}")
+
     def create_dataframe(self, features: Dict[str, Dict[str, np.ndarray]]) -> pd.DataFrame:
         """Creates a pandas DataFrame from the extracted features."""
-        df_list = []
-        for key, feature_dict in features.items():
-            df = pd.DataFrame(feature_dict)
-            df['Truth'] = key
-            df_list.append(df)
-
+        processes = list(features.keys())
+        df_list = [pd.DataFrame(feature_dict) for feature_dict in features.values()]
         df = pd.concat(df_list, ignore_index=True)
-        df['target'] = df['Truth'].apply(lambda x: 1 if 'SIG' in x else 0)
+
+        # Store the process of each event as an integer code into the dataset keys
+        codes = np.repeat(np.arange(len(processes)), [len(process_df) for process_df in df_list])
+        is_signal = np.array(['SIG' in process for process in processes])
+
+        df['Truth'] = pd.Categorical.from_codes(codes, categories=processes)
+        df['target'] = is_signal[codes].astype(np.int64)
         return df
 
+    def create_feature_matrix(self, features: Dict[str, Dict[str, np.ndarray]]) -> FeatureMatrix:
+        """Packs the extracted features into a float32 matrix with compact label arrays."""
+        return FeatureMatrix.from_features(features)
+
     def scale_features(self, X: np.ndarray) -> np.ndarray:
         """Scales the features using the specified scaler."""
         return self.scaler.fit_transform(X)
@@ -46,25 +60,49 @@ class Preprocessor:
             X, y, df, test_size=self.test_size, stratify=y, random_state=self.random_state
         )
 
-        if self.oversample_signal:
-            df_train = self._oversample_signal(df_train)
-            X_train = df_train[feature_cols].values
-            y_train = df_train['target'].values
+        X_train, y_train = self._oversample(X_train, y_train)
 
         X_train_scaled = self.scale_features(X_train)
         X_test_scaled = self.scaler.transform(X_test)
 
         return X_train_scaled, X_test_scaled, y_train, y_test, df_train, df_test
 
-    def _oversample_signal(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Oversamples the signal class to match the number of background instances."""
-        df_sig = df[df['target'] == 1]
-        df_bkg = df[df['target'] == 0]
-
-        df_sig_oversampled = df_sig.sample(n=len(df_bkg), replace=True, random_state=self.random_state)
-        df_oversampled = pd.concat([df_sig_oversampled, df_bkg])
-
-        return df_oversampled.sample(frac=1, random_state=self.random_state)  # Shuffle
+    def _oversample_signal_indices(self, index: np.ndarray, target: np.ndarray) -> np.ndarray:
+        """Oversamples the signal indices to match the number of background instances."""
+        sig = index[target[index] == 1]
+        bkg = index[target[index] == 0]
+
+        sig_oversampled = sig[
+            np.random.RandomState(self.random_state).choice(len(sig), size=len(bkg), replace=True)
+        ]
+        oversampled = np.concatenate([sig_oversampled, bkg])
+
+        return oversampled[
+            np.random.RandomState(self.random_state).permutation(len(oversampled))
+        ]  # Shuffle
+
+    def _oversample(self, X_train, y_train) -> Tuple[np.ndarray, np.ndarray]:
+        """Gathers the oversampled training rows, when oversampling by index."""
+        if not self.oversample_signal or self.oversampling != 'indices':
+            return X_train, y_train
+
+        y_train = np.asarray(y_train)
+        index = self._oversample_signal_indices(np.arange(len(y_train)), y_train)
+        return np.asarray(X_train)[index], y_train[index]
+
+    def sample_weights(self, y_train: np.ndarray) -> np.ndarray | None:
+        """Training weights balancing signal against background, when oversampling by weight."""
+        if not self.oversample_signal or self.oversampling != 'weights':
+            return None
+
+        y_train = np.asarray(y_train)
+        n_sig = np.count_nonzero(y_train == 1)
+        if n_sig == 0:
+            raise ValueError(
+                "No signal events in the training set to weight; "
+                "loosen the mass cut or check the datasets"
+            )
+        return np.where(y_train == 1, (len(y_train) - n_sig) / n_sig, 1.0)
 
     def prepare_data(self, features: Dict[str, Dict[str, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, pd.DataFrame, pd.DataFrame]:
         """Prepares the data for model training."""
@@ -73,12 +111,30 @@ class Preprocessor:
         return self.split_data(df, feature_cols)
 
     def prepare_fold_data(self, X_train, X_test, y_train, y_test, df_train, df_test):
-        if self.oversample_signal:
-            df_train = self._oversample_signal(df_train)
-            X_train = df_train.drop(["target", "Truth"], axis=1).values
-            y_train = df_train["target"].values
+        X_train, y_train = self._oversample(X_train, y_train)
 
         X_train_scaled = self.scale_features(X_train)
         X_test_scaled = self.scaler.transform(X_test)
 
         return X_train_scaled, X_test_scaled, y_train, y_test, df_train, df_test
+
+    def split_indices(self, target: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Splits the event indices into training and test sets, stratified on the target."""
+        return train_test_split(
+            np.arange(len(target)),
+            test_size=self.test_size,
+            stratify=target,
+            random_state=self.random_state,
+        )
+
+    def prepare_matrix_data(
+        self, matrix: FeatureMatrix, train_index: np.ndarray, test_index: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Gathers and scales the training and test rows of a feature matrix."""
+        if self.oversample_signal and self.oversampling == 'indices':
+            train_index = self._oversample_signal_indices(train_index, matrix.target)
+
+        X_train_scaled = self.scale_features(matrix.X[train_index])
+        X_test_scaled = self.scaler.transform(matrix.X[test_index])
+
+        return X_train_scaled, X_test_scaled, matrix.target[train_index], matrix.target[test_index]
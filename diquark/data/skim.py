@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import awkward as ak
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class SkimStore:
+    """Compact Parquet copies of the columns of Delphes files, written once by `diquark skim`.
+
+    Each skim is a Parquet file of flat per-event and jagged per-jet columns,
+    in row groups of `row_group_size` events so that an entry range only
+    decompresses the row groups it overlaps. A JSON sidecar records the
+    source file's size and modification time, and a skim is only used while
+    they still match and it holds all the requested columns.
+    """
+
+    # Bump whenever the layout of the skims changes, to rewrite them
+    version = 1
+
+    def __init__(self, directory: str, row_group_size: int = 20_000, compression: str = "zstd"):
+        self.directory = Path(directory)
+        self.row_group_size = row_group_size
+        self.compression = compression
+
+    def path(self, source: str) -> Path:
+        """Skim file of a source file; the hash tells apart same-named files in other folders."""
+        source = Path(source).resolve()
+        digest = hashlib.sha256(str(source).encode()).hexdigest()[:12]
+        return self.directory / f"{source.stem}-{digest}.parquet"
+
+    def _source_identity(self, source: str) -> dict | None:
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return None
+        return {
+            "source": str(Path(source).resolve()),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+        }
+
+    def manifest(self, source: str) -> dict | None:
+        try:
+            with open(self.path(source).with_suffix(".json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, OSError, json.JSONDecodeError):
+            return None
+
+    def is_fresh(self, source: str, columns: list[str]) -> bool:
+        """Whether the skim of `source` is up to date with it and holds all of `columns`."""
+        manifest = self.manifest(source)
+        if manifest is None or manifest["version"] != self.version:
+            return False
+
+        identity = self._source_identity(source)
+        if identity is None or any(manifest[name] != value for name, value in identity.items()):
+            return False
+
+        return set(columns) <= set(manifest["columns"])
+
+    def compressed_bytes(self, source: str, entry_start: int = None, entry_stop: int = None) -> int:
+        """Bytes of the skim in an entry range, assuming evenly sized entries."""
+        manifest = self.manifest(source)
+        n_entries = manifest["n_entries"]
+        entry_start = entry_start or 0
+        entry_stop = n_entries if entry_stop is None else min(entry_stop, n_entries)
+        return int(max(entry_stop - entry_start, 0) / max(n_entries, 1) * manifest["bytes"])
+
+    def write(self, source: str, chunks: Iterator[ak.Array]) -> dict:
+        """Write the chunks read from `source` as its skim, returning the skim's manifest."""
+        # Taken before reading, so a source modified meanwhile makes the skim stale
+        identity = self._source_identity(source)
+
+        path = self.path(source)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+
+        writer = None
+        n_entries = 0
+        try:
+            try:
+                for chunk in self._row_groups(chunks):
+                    table = to_arrow_table(chunk)
+                    if writer is None:
+                        writer = pq.ParquetWriter(
+                            tmp_path, table.schema, compression=self.compression,
+                            use_dictionary=False, write_statistics=False,
+                        )
+                    writer.write_table(table, row_group_size=self.row_group_size)
+                    n_entries += len(chunk)
+            finally:
+                if writer is not None:
+                    writer.close()
+
+            if writer is None:
+                raise ValueError(f"No entries read from {source}")
+            os.replace(tmp_path, path)
+        except BaseException:
+            # A failed or interrupted skim would otherwise leave a partial file of up to GBs behind
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        # The manifest is written last, so a skim is never used before it is complete
+        manifest = {
+            "version": self.version,
+            **identity,
+            "columns": writer.schema.names,
+            "n_entries": n_entries,
+            "bytes": path.stat().st_size,
+        }
+        manifest_path = path.with_suffix(".json")
+        tmp_manifest_path = manifest_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_manifest_path, "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_manifest_path, manifest_path)
+        except BaseException:
+            tmp_manifest_path.unlink(missing_ok=True)
+            raise
+
+        return manifest
+
+    def _row_groups(self, chunks: Iterator[ak.Array]) -> Iterator[ak.Array]:
+        """Regroup the chunks into whole row groups, whatever size they were read in."""
+        pending = None
+        for chunk in chunks:
+            pending = chunk if pending is None else ak.concatenate([pending, chunk])
+            while len(pending) >= self.row_group_size:
+                yield pending[:self.row_group_size]
+                pending = pending[self.row_group_size:]
+
+        if pending is not None and len(pending) > 0:
+            yield pending
+
+    def read(
+        self, source: str, columns: list[str], entry_start: int = 0, entry_stop: int = None
+    ) -> ak.Array:
+        """Read the entries [entry_start, entry_stop), decompressing only their row groups."""
+        chunks = list(self.iterate(source, columns, entry_start, entry_stop))
+        if len(chunks) == 1:
+            return chunks[0]
+        return ak.concatenate(chunks)
+
+    def iterate(self, source: str, columns: list[str], entry_start: int = 0, entry_stop: int = None,
+                step_size: int | str = None) -> Iterator[ak.Array]:
+        """Iterate over the entries of the skim in chunks of `step_size` entries, or by row group.
+
+        Like uproot, a step size given in bytes (e.g. "100 MB") sets the chunks
+        from the file's layout; here they are its row groups.
+        """
+        with pq.ParquetFile(self.path(source)) as file:
+            n_entries = file.metadata.num_rows
+            entry_start = min(entry_start or 0, n_entries)
+            entry_stop = n_entries if entry_stop is None else min(entry_stop, n_entries)
+            step = step_size if isinstance(step_size, int) else None
+
+            pending = None
+            group_start = 0
+            for group in range(file.metadata.num_row_groups):
+                group_stop = group_start + file.metadata.row_group(group).num_rows
+                if group_stop > entry_start and group_start < entry_stop:
+                    table = file.read_row_group(group, columns=columns)
+                    arr = from_arrow_table(table)[
+                        max(entry_start - group_start, 0) : entry_stop - group_start
+                    ]
+
+                    if step is None:
+                        yield arr
+                    else:
+                        pending = arr if pending is None else ak.concatenate([pending, arr])
+                        while len(pending) >= step:
+                            yield pending[:step]
+                            pending = pending[step:]
+                group_start = group_stop
+
+            if pending is not None and len(pending) > 0:
+                yield pending
+            elif entry_start >= entry_stop:
+                yield from_arrow_table(file.schema_arrow.empty_table().select(columns))
+
+
+def to_arrow_table(arr: ak.Array) -> pa.Table:
+    """Flat per-event fields become Arrow arrays and jagged per-jet fields list arrays.
+
+    Both are built from the awkward buffers, without going through Python objects.
+    """
+    columns = {}
+    for field in arr.fields:
+        column = arr[field]
+        if column.ndim == 1:
+            columns[field] = pa.array(ak.to_numpy(column))
+        else:
+            counts = ak.to_numpy(ak.num(column, axis=1))
+            offsets = np.zeros(len(counts) + 1, dtype=np.int32)
+            np.cumsum(counts, out=offsets[1:])
+            values = ak.to_numpy(ak.flatten(column, axis=1))
+            columns[field] = pa.ListArray.from_arrays(pa.array(offsets), pa.array(values))
+    return pa.table(columns)
+
+
+def from_arrow_table(table: pa.Table) -> ak.Array:
+    """Inverse of to_arrow_table: a record array with the same fields as uproot's."""
+    columns = {}
+    for field in table.column_names:
+        column = table.column(field).combine_chunks()
+        if pa.types.is_list(column.type):
+            columns[field] = ak.unflatten(
+                column.flatten().to_numpy(), column.value_lengths().to_numpy()
+            )
+        else:
+            columns[field] = column.to_numpy()
+    return ak.zip(columns, depth_limit=1)
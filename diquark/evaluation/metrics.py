@@ -1,57 +1,50 @@
 import numpy as np
 import pandas as pd
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score, average_precision_score, auc
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, auc
 
+from diquark.evaluation.score_distribution import ScoreDistribution
 
-def calculate_metrics(y_true: np.ndarray, y_pred: np.ndarray, sample_weights: np.ndarray,
-                      thresholds: np.ndarray, use_real_event_percentiles: bool) -> dict[str, float]:
+
+def calculate_metrics(distribution: ScoreDistribution, thresholds: np.ndarray,
+                      use_real_event_percentiles: bool) -> dict[str, float]:
     precision, recall, pr_thresholds = weighted_precision_recall_curve(
-        y_true, y_pred, sample_weights, thresholds,
+        distribution, thresholds,
         use_real_event_percentiles
     )
     pr_auc = auc(recall, precision)
 
+    # Unweighted curves over every distinct score, from the already sorted scores
+    fpr, tpr, _ = distribution.roc_curve()
+    curve_precision, curve_recall, _ = distribution.precision_recall_curve()
+
+    y_true = distribution.y_true
+    y_pred = distribution.y_pred
+
     return {
         "accuracy": accuracy_score(y_true, (y_pred > 0.5).astype(int)),
         "precision": precision_score(y_true, (y_pred > 0.5).astype(int)),
         "recall": recall_score(y_true, (y_pred > 0.5).astype(int)),
         "f1_score": f1_score(y_true, (y_pred > 0.5).astype(int)),
-        "roc_auc": roc_auc_score(y_true, y_pred),
-        "average_precision": average_precision_score(y_true, y_pred),
+        "roc_auc": auc(fpr, tpr),
+        "average_precision": -np.sum(np.diff(curve_recall) * curve_precision[:-1]),
         'weighted_pr_auc': pr_auc,
         'weighted_precision': precision,
         'weighted_recall': recall,
         'weighted_pr_thresholds': pr_thresholds
     }
 
-def weighted_precision_recall_curve(y_true, y_pred, sample_weights, thresholds, use_real_event_percentiles):
-
-    if use_real_event_percentiles:
-        sorted_indices = np.argsort(y_pred)
-        cumulative_weights = np.cumsum(sample_weights[sorted_indices])
-        total_weight = cumulative_weights[-1]
-        percentile_thresholds = [np.searchsorted(cumulative_weights, threshold * total_weight) for threshold in thresholds]
-        thresholds = y_pred[sorted_indices[percentile_thresholds]]
-    else:
-        thresholds = np.quantile(y_pred, thresholds)
 
+def weighted_precision_recall_curve(
+    distribution: ScoreDistribution, thresholds, use_real_event_percentiles
+):
+    thresholds = distribution.thresholds(thresholds, use_real_event_percentiles)
     thresholds = np.sort(np.unique(np.concatenate([thresholds, [0, 1]])))
 
-    precision = []
-    recall = []
-
-    true_positives = np.sum(sample_weights[y_true == 1])
-
-    for threshold in thresholds:
-        y_pred_binary = (y_pred >= threshold)
-        tp = np.sum(sample_weights[y_pred_binary & (y_true == 1)])
-        fp = np.sum(sample_weights[y_pred_binary & (y_true == 0)])
-
-        p = tp / (tp + fp) if (tp + fp) > 0 else 0
-        r = tp / true_positives if true_positives > 0 else 0
+    fp, tp = distribution.class_weights(thresholds, inclusive=True)
+    _, true_positives = distribution.class_totals()
 
-        precision.append(p)
-        recall.append(r)
+    precision = np.divide(tp, tp + fp, out=np.zeros_like(tp), where=(tp + fp) > 0)
+    recall = tp / true_positives if true_positives > 0 else np.zeros_like(tp)
 
     # Ensure monotonicity
     precision = np.maximum.accumulate(precision[::-1])[::-1]
@@ -171,82 +164,43 @@ def weighted_precision_recall_curve(y_true, y_pred, sample_weights, thresholds,
 #     return df_counts
 
 
-def calculate_signal_background_metrics(y_true, y_pred, thresholds, sample_weights, total_luminosity, cross_sections, use_real_event_percentiles):
-    signal = y_true == 1
-    background = y_true == 0
+def calculate_signal_background_metrics(
+    distribution: ScoreDistribution, thresholds, use_real_event_percentiles
+):
+    thresholds = distribution.thresholds(thresholds, use_real_event_percentiles)
 
-    if use_real_event_percentiles:
-        # Sort predictions and weights together
-        sorted_indices = np.argsort(y_pred)
-        sorted_pred = y_pred[sorted_indices]
-        sorted_weights = sample_weights[sorted_indices]
+    b, s = distribution.class_weights(thresholds)
+    total_b, total_s = distribution.class_totals()
 
-        # Calculate cumulative weights
-        cumulative_weights = np.cumsum(sorted_weights)
-        total_weight = cumulative_weights[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        signal_eff = s / total_s
+        bkg_rej = 1 - b / total_b
+        significance = np.divide(s, np.sqrt(s + b), out=np.zeros_like(s), where=(s + b) > 0)
+        s_over_b = np.divide(s, b, out=np.full_like(s, np.inf), where=b > 0)
 
-        # Calculate thresholds based on weighted percentiles
-        thresholds = np.array([sorted_pred[np.searchsorted(cumulative_weights / total_weight, t)] for t in thresholds])
-    else:
-        # Use regular percentiles when the flag is False
-        thresholds = np.quantile(y_pred, np.array(thresholds))
-
-    signal_eff = []
-    bkg_rej = []
-    significance = []
-    s_over_b = []
+    return {
+        "signal_efficiency": signal_eff,
+        "background_rejection": bkg_rej,
+        "significance": significance,
+        "s_over_b": s_over_b,
+        "thresholds": thresholds
+    }
 
-    for threshold in thresholds:
-        y_pred_binary = (y_pred > threshold).astype(int)
 
-        s = np.sum(y_pred_binary[signal] * sample_weights[signal])
-        b = np.sum(y_pred_binary[background] * sample_weights[background])
+def calculate_counts_for_score_cuts(
+    distribution: ScoreDistribution, total_luminosity, cuts, use_real_event_percentiles
+):
+    thresholds = distribution.thresholds(cuts, use_real_event_percentiles)
 
-        signal_eff.append(np.sum(y_pred_binary[signal] * sample_weights[signal]) / np.sum(sample_weights[signal]))
-        bkg_rej.append(1 - (np.sum(y_pred_binary[background] * sample_weights[background]) / np.sum(sample_weights[background])))
-        significance.append(s / np.sqrt(s + b) if (s + b) > 0 else 0)
-        s_over_b.append(s / b if b > 0 else np.inf)
+    # Unweighted number of events of each process passing each cut
+    passing = distribution.passing_counts(thresholds)
+    scale = total_luminosity * distribution.process_cross_sections / distribution.process_counts()
 
-    return {
-        "signal_efficiency": np.array(signal_eff),
-        "background_rejection": np.array(bkg_rej),
-        "significance": np.array(significance),
-        "s_over_b": np.array(s_over_b),
-        "thresholds": thresholds
+    results = {
+        cut: {process: passing[i, j] * scale[i] for i, process in enumerate(distribution.processes)}
+        for j, cut in enumerate(cuts)
     }
 
-def calculate_counts_for_score_cuts(y_true, y_pred, mnj, truth, cross_sections, total_luminosity, cuts, use_real_event_percentiles):
-    results = {}
-
-    if use_real_event_percentiles:
-        weights = np.array([cross_sections[t] for t in truth])
-        sorted_indices = np.argsort(y_pred)
-        sorted_pred = y_pred[sorted_indices]
-        sorted_weights = weights[sorted_indices]
-        cumulative_weights = np.cumsum(sorted_weights)
-        total_weight = cumulative_weights[-1]
-
-    keys = np.unique(truth)
-    truth_masks = { key: truth == key for key in keys }
-    truth_counts = { key: truth_masks[key].sum() for key in keys }
-
-    for cut in cuts:
-        if use_real_event_percentiles:
-            threshold = sorted_pred[np.searchsorted(cumulative_weights / total_weight, cut)]
-        else:
-            threshold = np.quantile(y_pred, cut)
-
-        scores = {}
-        for key in keys:
-            mask = truth_masks[key] & (y_pred > threshold)
-            scores[key] = mnj[mask]
-
-        counts = {
-            k: len(v) * total_luminosity * cross_sections[k] / truth_counts[k]
-            for k, v in scores.items()
-        }
-        results[cut] = counts
-
     df_counts = pd.DataFrame(results)
 
     # Ensure 'SIG:Suu' is the last row before summary rows
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+
+class ScoreDistribution:
+    """Classifier scores of a test set, sorted once and shared by all evaluation code.
+
+    Every event belongs to a process with a fixed cross-section, so the
+    per-process cumulative event counts along the sorted scores answer
+    weighted and unweighted "how much passes this threshold" queries with a
+    binary search, for any number of thresholds.
+    """
+
+    def __init__(self, y_pred: np.ndarray, truth: pd.Categorical, cross_sections: dict[str, float]):
+        self.y_pred = np.asarray(y_pred)
+
+        # Processes present in the test set, in category order
+        truth = pd.Categorical(truth)
+        present = np.bincount(truth.codes, minlength=len(truth.categories)) > 0
+        processes = np.asarray(truth.categories)[present]
+        codes = (np.cumsum(present) - 1)[truth.codes]
+
+        self.processes = processes
+        self.codes = codes
+        self.process_cross_sections = np.array(
+            [cross_sections[process] for process in processes], dtype=np.float64
+        )
+        self.is_signal_process = np.array(['SIG' in process for process in processes])
+
+        # Global score order, with cumulative cross-section weights for percentile queries
+        self.order = np.argsort(self.y_pred, kind='stable')
+        self.sorted_pred = self.y_pred[self.order]
+        self.cumulative_weights = np.cumsum(self.process_cross_sections[codes[self.order]])
+
+        # The same order regrouped by process: scores sorted within each process
+        by_process = self.order[np.argsort(codes[self.order], kind='stable')]
+        self.process_sorted_pred = self.y_pred[by_process]
+        self.process_bounds = np.searchsorted(codes[by_process], np.arange(len(processes) + 1))
+
+    @property
+    def y_true(self) -> np.ndarray:
+        return self.is_signal_process[self.codes].astype(int)
+
+    @property
+    def sample_weights(self) -> np.ndarray:
+        return self.process_cross_sections[self.codes]
+
+    def process_counts(self) -> np.ndarray:
+        """Number of events of each process."""
+        return np.diff(self.process_bounds)
+
+    def thresholds(self, quantiles, use_real_event_percentiles: bool) -> np.ndarray:
+        """Score thresholds at the given quantiles of the raw or cross-section weighted events."""
+        quantiles = np.asarray(quantiles, dtype=np.float64)
+
+        if not use_real_event_percentiles:
+            return np.quantile(self.y_pred, quantiles)
+
+        positions = np.searchsorted(
+            self.cumulative_weights, quantiles * self.cumulative_weights[-1]
+        )
+        return self.sorted_pred[np.minimum(positions, len(self.sorted_pred) - 1)]
+
+    def passing_counts(self, thresholds, inclusive: bool = False) -> np.ndarray:
+        """(n_processes, n_thresholds) events scoring above (or at, if inclusive) each threshold."""
+        thresholds = np.asarray(thresholds)
+        side = 'left' if inclusive else 'right'
+
+        counts = np.empty((len(self.processes), len(thresholds)), dtype=np.int64)
+        for i in range(len(self.processes)):
+            start, stop = self.process_bounds[i], self.process_bounds[i + 1]
+            counts[i] = (stop - start) - np.searchsorted(
+                self.process_sorted_pred[start:stop], thresholds, side=side
+            )
+        return counts
+
+    def passing_weights(self, thresholds, inclusive: bool = False) -> np.ndarray:
+        """(n_processes, n_thresholds) cross-section weight of the events passing each threshold."""
+        return self.passing_counts(thresholds, inclusive) * self.process_cross_sections[:, None]
+
+    def class_weights(self, thresholds, inclusive: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        """Background and signal weights passing each threshold."""
+        weights = self.passing_weights(thresholds, inclusive)
+        return weights[~self.is_signal_process].sum(axis=0), weights[self.is_signal_process].sum(
+            axis=0
+        )
+
+    def class_totals(self) -> tuple[float, float]:
+        """Total background and signal weights."""
+        weights = self.process_counts() * self.process_cross_sections
+        return weights[~self.is_signal_process].sum(), weights[self.is_signal_process].sum()
+
+    def binary_curve(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Unweighted false and true positives at every distinct score, in decreasing order."""
+        descending_pred = self.sorted_pred[::-1]
+        descending_true = self.is_signal_process[self.codes[self.order[::-1]]]
+
+        # Last position of each distinct score
+        distinct = np.r_[np.flatnonzero(np.diff(descending_pred)), len(descending_pred) - 1]
+        tps = np.cumsum(descending_true)[distinct]
+        fps = (distinct + 1) - tps
+        return fps, tps, descending_pred[distinct]
+
+    def roc_curve(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        fps, tps, thresholds = self.binary_curve()
+        fps = np.r_[0, fps]
+        tps = np.r_[0, tps]
+        return fps / fps[-1], tps / tps[-1], np.r_[np.inf, thresholds]
+
+    def precision_recall_curve(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        fps, tps, thresholds = self.binary_curve()
+        precision = tps / (tps + fps)
+        recall = tps / tps[-1]
+
+        # Reverse so recall is decreasing, ending at (recall 0, precision 1)
+        return np.r_[precision[::-1], 1], np.r_[recall[::-1], 0], thresholds[::-1]
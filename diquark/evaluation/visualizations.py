@@ -4,7 +4,6 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from typing import Any
 from .metrics import calculate_signal_background_metrics
-from sklearn.metrics import roc_curve, precision_recall_curve
 
 
 def plot_results(results: dict[str, Any], df_test: pd.DataFrame, plot_types: list[str], real_percentiles) -> dict[str, go.Figure]:
@@ -12,7 +11,7 @@ def plot_results(results: dict[str, Any], df_test: pd.DataFrame, plot_types: lis
     Create various plots based on model results.
 
     Args:
-        results: Dictionary containing model results (metrics, predictions, etc.).
+        results: Dictionary containing model results (metrics, score distribution, etc.).
         df_test: Test dataset as a pandas DataFrame.
         plot_types: List of plot types to generate.
 
@@ -22,11 +21,11 @@ def plot_results(results: dict[str, Any], df_test: pd.DataFrame, plot_types: lis
     plots = {}
 
     if 'roc_curve' in plot_types:
-        fpr, tpr, _ = roc_curve(df_test['target'], results['predictions'])
+        fpr, tpr, _ = results['distribution'].roc_curve()
         plots['roc_curve'] = plot_roc_curve(fpr, tpr, results['metrics']['roc_auc'])
 
     if 'pr_curve' in plot_types:
-        precision, recall, _ = precision_recall_curve(df_test['target'], results['predictions'])
+        precision, recall, _ = results['distribution'].precision_recall_curve()
         plots['pr_curve'] = plot_precision_recall_curve(recall, precision, results['metrics']['average_precision'])
 
     if 'weighted_pr_curve' in plot_types:
@@ -1,20 +1,60 @@
 from abc import ABC, abstractmethod
+from typing import Callable
+
 import numpy as np
-import awkward as ak
+
+from diquark.features.intermediates import JET_KINEMATICS, IntermediateStore
+
+
+def flattened_feature_names(name: str) -> list[str]:
+    return [
+        f"{name}_min",
+        f"{name}_mean",
+        f"{name}_stddev",
+        f"{name}_max",
+    ]
+
 
 class BaseFeature(ABC):
+    """A group of feature columns, computed from the intermediates shared by a chunk's features."""
+
     def __init__(self, name):
         self.name = name
 
+    def feature_names(self) -> list[str]:
+        """Names of the columns returned by compute, in order."""
+        return [self.name]
+
+    def branches(self) -> list[str]:
+        """Delphes branches that compute reads through the store; by default all jet kinematics."""
+        return JET_KINEMATICS
+
+    def combination_observables(self) -> dict[int, dict[str, Callable]]:
+        """Per-combination observables to reduce in the shared k-jet combination passes, by k."""
+        return {}
+
     @abstractmethod
-    def compute(self, data: ak.Array) -> np.ndarray:
-        """Compute the feature from the given data."""
+    def compute(self, store: IntermediateStore) -> dict[str, np.ndarray]:
+        """Compute the feature columns from the given chunk's intermediates."""
         pass
 
-    def __call__(self, data: ak.Array) -> np.ndarray:
-        return self.compute(data)
-    
-    def _leading_jet_array(self, data: ak.Array, key: str, n_jets: int) -> ak.Array:
-        """Extract the leading jet feature from the awkward array."""
-        jet_pt_padded = ak.pad_none(data[key], n_jets, axis=-1, clip=True)
-        return ak.to_numpy(ak.fill_none(jet_pt_padded, 0))
\ No newline at end of file
+    def __call__(self, store: IntermediateStore) -> dict[str, np.ndarray]:
+        return self.compute(store)
+
+
+# Feature group name -> factory building the feature from a FeatureExtractor's parameters.
+# Groups are computed, and their columns ordered, in registration order.
+FEATURE_REGISTRY: dict[str, Callable[..., BaseFeature]] = {}
+
+
+def register_feature(name: str, factory: Callable[..., BaseFeature]) -> Callable[..., BaseFeature]:
+    """Make a feature group available to FeatureExtractor (and to `feature_extraction.features`).
+
+    `factory` is called with the FeatureExtractor and returns the BaseFeature.
+    The 'processes' backend pickles the features, so they and their
+    observables must be picklable, e.g. module-level functions or
+    functools.partial rather than lambdas. Bump
+    FeatureExtractor.schema_version when changing an existing feature.
+    """
+    FEATURE_REGISTRY[name] = factory
+    return factory
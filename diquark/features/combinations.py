@@ -0,0 +1,108 @@
+import functools
+import itertools
+from math import comb
+from typing import Iterator
+
+import numpy as np
+
+
+@functools.lru_cache(maxsize=None)
+def combination_table(n: int, k: int) -> np.ndarray:
+    """Index table of all k-subsets of range(n), in colexicographic order.
+
+    In colex order the combinations of the first m jets are exactly the first
+    comb(m, k) rows, so a single table per (n, k) serves every multiplicity.
+    """
+    dtype = np.int8 if n <= np.iinfo(np.int8).max else np.int16
+    flat = np.fromiter(
+        itertools.chain.from_iterable(itertools.combinations(range(n), k)),
+        dtype=dtype,
+        count=comb(n, k) * k,
+    )
+    table = flat.reshape(-1, k)
+    table = table[np.lexsort(table.T)]
+    table.setflags(write=False)
+    return table
+
+
+class CombinationBlock:
+    """Summed jet kinematics for a block of k-jet combinations of a group of events.
+
+    Sums are computed lazily, so only the components an observable uses are read.
+    """
+
+    def __init__(self, jets: dict[str, np.ndarray], columns: np.ndarray):
+        self._jets = jets
+        self._columns = columns
+
+    def _sum(self, key: str) -> np.ndarray:
+        matrix = self._jets[key]
+        total = matrix[:, self._columns[:, 0]].astype(np.float64, copy=False)
+        for i in range(1, self._columns.shape[1]):
+            total += matrix[:, self._columns[:, i]]
+        return total
+
+    @functools.cached_property
+    def p_x(self) -> np.ndarray:
+        return self._sum("p_x")
+
+    @functools.cached_property
+    def p_y(self) -> np.ndarray:
+        return self._sum("p_y")
+
+    @functools.cached_property
+    def p_z(self) -> np.ndarray:
+        return self._sum("p_z")
+
+    @functools.cached_property
+    def energy(self) -> np.ndarray:
+        return self._sum("energy")
+
+    @functools.cached_property
+    def invariant_mass(self) -> np.ndarray:
+        mass_squared = self.energy**2 - self.p_x**2 - self.p_y**2 - self.p_z**2
+        return np.sqrt(np.maximum(mass_squared, 0.0))
+
+    @functools.cached_property
+    def vector_sum_pt(self) -> np.ndarray:
+        return np.sqrt(self.p_x**2 + self.p_y**2)
+
+
+class JetCombinations:
+    """Streams k-jet combinations of the leading jets in bounded-size blocks.
+
+    Events are grouped by their number of valid leading jets, so every
+    combination in a block is a real one and no padding masks are needed.
+    Each block holds at most `max_block_size` (event, combination) entries.
+    """
+
+    def __init__(
+        self, jets: dict[str, np.ndarray], n_valid: np.ndarray, max_block_size: int = 2**20
+    ):
+        self.jets = jets
+        self.n_events, self.n_jets = next(iter(jets.values())).shape
+        self.max_block_size = max_block_size
+
+        order = np.argsort(n_valid, kind="stable")
+        multiplicities, starts = np.unique(n_valid[order], return_index=True)
+        self._groups = dict(zip(multiplicities.tolist(), np.split(order, starts[1:])))
+
+    def blocks(self, k: int) -> Iterator[tuple[np.ndarray, CombinationBlock]]:
+        """Yield (event indices, CombinationBlock) pairs covering every k-jet combination."""
+        table = combination_table(self.n_jets, k)
+
+        for multiplicity, events in self._groups.items():
+            n_combinations = comb(multiplicity, k)
+            if n_combinations == 0:
+                continue
+
+            combinations_per_block = min(n_combinations, self.max_block_size)
+            events_per_block = max(1, self.max_block_size // combinations_per_block)
+
+            for event_start in range(0, len(events), events_per_block):
+                index = events[event_start:event_start + events_per_block]
+                jets = {key: matrix[index] for key, matrix in self.jets.items()}
+
+                for start in range(0, n_combinations, combinations_per_block):
+                    columns = table[start:min(start + combinations_per_block, n_combinations)]
+                    yield index, CombinationBlock(jets, columns)
@@ -0,0 +1,336 @@
+"""The built-in feature groups, registered in their output order."""
+import functools
+from typing import Callable
+
+import numpy as np
+import awkward as ak
+
+from diquark.features.base import BaseFeature, flattened_feature_names, register_feature
+from diquark.features.intermediates import BRANCHES, JET_KINEMATICS, IntermediateStore
+from diquark.features.reductions import RunningStatistics
+
+# Compute \chi^2 score with known-mass particles
+W_MASS = 80.3692
+W_MASS_SIGMA = 20
+SUU_MASS_SIGMA = 100
+
+
+@functools.lru_cache(maxsize=None)
+def pair_indices(n_jets: int) -> tuple[np.ndarray, np.ndarray]:
+    """First and second jet of every jet pair, in np.triu_indices(n_jets, 1) order."""
+    first, second = np.triu_indices(n_jets, 1)
+    first.setflags(write=False)
+    second.setflags(write=False)
+    return first, second
+
+
+def delta_r(
+    etas: np.ndarray, phis: np.ndarray, pts: np.ndarray, chunk_size: int = 4096
+) -> np.ndarray:
+    """(n_events, n_pairs) float32 angular distances of the leading jet pairs, 0 for missing jets.
+
+    Only the n_jets * (n_jets - 1) / 2 pairs are computed, chunk by chunk of
+    events into scratch buffers that are reused, so no n_jets x n_jets
+    matrices are built.
+    """
+    # Delphes branches are float32 already; np.take into a buffer of another dtype would copy it
+    etas, phis, pts = (np.asarray(array, dtype=np.float32) for array in (etas, phis, pts))
+    n_events, n_jets = etas.shape
+    first, second = pair_indices(n_jets)
+    n_pairs = len(first)
+
+    out = np.empty((n_events, n_pairs), dtype=np.float32)
+    rows = min(chunk_size, n_events)
+    a = np.empty((rows, n_pairs), dtype=np.float32)
+    b = np.empty((rows, n_pairs), dtype=np.float32)
+    valid = np.empty((rows, n_pairs), dtype=bool)
+
+    for start in range(0, n_events, chunk_size):
+        stop = min(start + chunk_size, n_events)
+        n = stop - start
+        result, a_n, b_n, valid_n = out[start:stop], a[:n], b[:n], valid[:n]
+
+        # |delta phi|, wrapped into [0, pi]
+        np.take(phis[start:stop], first, axis=1, out=a_n)
+        np.take(phis[start:stop], second, axis=1, out=b_n)
+        np.subtract(a_n, b_n, out=a_n)
+        np.abs(a_n, out=a_n)
+        np.subtract(np.float32(2 * np.pi), a_n, out=b_n)
+        np.minimum(a_n, b_n, out=a_n)
+        np.square(a_n, out=a_n)
+
+        np.take(etas[start:stop], first, axis=1, out=result)
+        np.take(etas[start:stop], second, axis=1, out=b_n)
+        np.subtract(result, b_n, out=result)
+        np.square(result, out=result)
+
+        np.add(result, a_n, out=result)
+        np.sqrt(result, out=result)
+
+        # Pairs with a missing (zero-p_T padded) jet are zero
+        np.take(pts[start:stop], first, axis=1, out=a_n)
+        np.take(pts[start:stop], second, axis=1, out=b_n)
+        np.multiply(a_n, b_n, out=a_n)
+        np.greater(a_n, 0, out=valid_n)
+        np.multiply(result, valid_n, out=result)
+
+    return out
+
+
+def symmetric_eigenvalues_3x3(a11: np.ndarray, a22: np.ndarray, a33: np.ndarray,
+                              a12: np.ndarray, a13: np.ndarray, a23: np.ndarray,
+                              degeneracy_gap: float = 1e-4) -> np.ndarray:
+    """(n, 3) ascending eigenvalues of a batch of symmetric 3x3 matrices, from their components.
+
+    Uses the closed form of Smith (1961). It loses precision around
+    (near-)double roots, e.g. the double 0 of a single jet's tensor, so
+    matrices with two eigenvalues closer than `degeneracy_gap` are solved
+    with np.linalg.eigvalsh instead.
+    """
+    q = (a11 + a22 + a33) / 3
+    p = np.sqrt(((a11 - q)**2 + (a22 - q)**2 + (a33 - q)**2 + 2 * (a12**2 + a13**2 + a23**2)) / 6)
+
+    # B = (A - q I) / p, whose determinant fixes the angle between the eigenvalues;
+    # multiples of the identity (p = 0) have the single eigenvalue q
+    scale = np.divide(1.0, p, out=np.zeros_like(p), where=p > 0)
+    b11, b22, b33 = (a11 - q) * scale, (a22 - q) * scale, (a33 - q) * scale
+    b12, b13, b23 = a12 * scale, a13 * scale, a23 * scale
+    det = (
+        b11 * (b22 * b33 - b23 * b23)
+        - b12 * (b12 * b33 - b23 * b13)
+        + b13 * (b12 * b23 - b22 * b13)
+    )
+    phi = np.arccos(np.clip(det / 2, -1.0, 1.0)) / 3
+
+    largest = q + 2 * p * np.cos(phi)
+    smallest = q + 2 * p * np.cos(phi + 2 * np.pi / 3)
+    middle = 3 * q - largest - smallest
+    eigenvalues = np.stack((smallest, middle, largest), axis=-1)
+
+    degenerate = np.flatnonzero(np.diff(eigenvalues, axis=1).min(axis=1) < degeneracy_gap)
+    if len(degenerate):
+        components = [
+            component[degenerate] for component in (a11, a12, a13, a12, a22, a23, a13, a23, a33)
+        ]
+        eigenvalues[degenerate] = np.linalg.eigvalsh(
+            np.stack(components, axis=-1).reshape(-1, 3, 3)
+        )
+
+    return eigenvalues
+
+
+def event_shape_eigenvalues(mask: np.ndarray, p_x: np.ndarray, p_y: np.ndarray, p_z: np.ndarray,
+                            chunk_size: int = 4096) -> np.ndarray:
+    """Sorted eigenvalues of the sphericity tensor of the masked events, from padded momenta.
+
+    Chunks of events are converted to float64 one at a time; each of the
+    six unique tensor components is then a single einsum over the jets,
+    and the eigenvalues are solved in closed form.
+    """
+    events = np.flatnonzero(mask)
+    eigenvalues = np.empty((len(events), 3))
+
+    for start in range(0, len(events), chunk_size):
+        index = events[start:start + chunk_size]
+        x, y, z = (momentum[index].astype(np.float64, copy=False) for momentum in (p_x, p_y, p_z))
+
+        xx, yy, zz, xy, xz, yz = (np.einsum("nj,nj->n", a, b)
+                                  for a, b in ((x, x), (y, y), (z, z), (x, y), (x, z), (y, z)))
+        total = xx + yy + zz
+
+        eigenvalues[start:start + len(index)] = symmetric_eigenvalues_3x3(
+            xx / total, yy / total, zz / total, xy / total, xz / total, yz / total
+        )
+
+    return eigenvalues
+
+
+class JetMultiplicity(BaseFeature):
+    def branches(self) -> list[str]:
+        return [BRANCHES["num_jets"]]
+
+    def compute(self, store: IntermediateStore) -> dict[str, np.ndarray]:
+        return {self.name: store.num_jets}
+
+
+class JetStatistics(BaseFeature):
+    """Min, mean, stddev and max over each event's jets of a jet quantity of the store."""
+
+    def __init__(self, name: str, quantity: str):
+        super().__init__(name)
+        self.quantity = quantity
+
+    def feature_names(self) -> list[str]:
+        return flattened_feature_names(self.name)
+
+    def branches(self) -> list[str]:
+        return [BRANCHES[self.quantity]]
+
+    def compute(self, store: IntermediateStore) -> dict[str, np.ndarray]:
+        return RunningStatistics.from_lists(getattr(store, self.quantity)).flatten(self.name)
+
+
+class DeltaR(BaseFeature):
+    def feature_names(self) -> list[str]:
+        return flattened_feature_names(self.name)
+
+    def compute(self, store: IntermediateStore) -> dict[str, np.ndarray]:
+        values = delta_r(store.padded_eta, store.padded_phi, store.padded_p_T)
+        return RunningStatistics.from_lists(values).flatten(self.name)
+
+
+class EventShape(BaseFeature):
+    def feature_names(self) -> list[str]:
+        return ["sphericity", "aplanarity"]
+
+    def branches(self) -> list[str]:
+        return [BRANCHES["num_jets"], *JET_KINEMATICS]
+
+    def compute(self, store: IntermediateStore) -> dict[str, np.ndarray]:
+        mask = store.non_zero_jets
+        eigenvalues = event_shape_eigenvalues(
+            mask, store.padded_p_x, store.padded_p_y, store.padded_p_z
+        )
+
+        # Compute sphericity and aplanarity
+        lambda_2 = eigenvalues[:, 1]
+        lambda_3 = eigenvalues[:, 0]
+
+        sphericity = np.zeros_like(store.num_jets, dtype=np.float64)
+        aplanarity = np.zeros_like(store.num_jets, dtype=np.float64)
+
+        sphericity[mask] = 3/2 * (lambda_2 + lambda_3)
+        aplanarity[mask] = 3/2 * lambda_3
+
+        return {"sphericity": sphericity, "aplanarity": aplanarity}
+
+
+class Centrality(BaseFeature):
+    def compute(self, store: IntermediateStore) -> dict[str, np.ndarray]:
+        total_energy = store.total_energy
+        centrality = np.divide(
+            store.total_p_T, total_energy,
+            out=np.zeros_like(total_energy, dtype=np.float64),
+            where=total_energy > 0,
+        )
+        return {self.name: centrality}
+
+
+class EventSum(BaseFeature):
+    """A per-event total that the store already computes, e.g. total_energy."""
+
+    def compute(self, store: IntermediateStore) -> dict[str, np.ndarray]:
+        return {self.name: getattr(store, self.name)}
+
+
+class CombinedInvariantMass(BaseFeature):
+    def compute(self, store: IntermediateStore) -> dict[str, np.ndarray]:
+        p_x_total = ak.sum(store.p_x, axis=-1).to_numpy()
+        p_y_total = ak.sum(store.p_y, axis=-1).to_numpy()
+        p_z_total = ak.sum(store.p_z, axis=-1).to_numpy()
+        total_energy = store.total_energy
+
+        total_mass_squared = total_energy**2 - p_x_total**2 - p_y_total**2 - p_z_total**2
+
+        mass = np.sqrt(
+            total_mass_squared,
+            out=np.zeros_like(total_energy, dtype=np.float64),
+            where=total_mass_squared >= 0
+        )
+        return {self.name: np.nan_to_num(mass)}
+
+
+class CombinationFeature(BaseFeature):
+    """Min, mean, stddev and max of an observable over each event's k-jet combinations."""
+
+    def __init__(self, name: str, k: int, observable: Callable):
+        super().__init__(name)
+        self.k = k
+        self.observable = observable
+
+    def feature_names(self) -> list[str]:
+        return flattened_feature_names(self.name)
+
+    def combination_observables(self) -> dict[int, dict[str, Callable]]:
+        return {self.k: {self.name: self.observable}}
+
+    def compute(self, store: IntermediateStore) -> dict[str, np.ndarray]:
+        return store.combination_statistics(self.k)[self.name].flatten(self.name)
+
+
+class CombinationCount(CombinationFeature):
+    """Number of each event's k-jet combinations for which a boolean observable holds."""
+
+    def feature_names(self) -> list[str]:
+        return [self.name]
+
+    def compute(self, store: IntermediateStore) -> dict[str, np.ndarray]:
+        return {self.name: store.combination_statistics(self.k)[self.name].sum.astype(np.int64)}
+
+
+def invariant_mass(block):
+    return block.invariant_mass
+
+
+def vector_sum_pt(block):
+    return block.vector_sum_pt
+
+
+def near_w_mass(block):
+    return (block.invariant_mass >= 60) & (block.invariant_mass <= 100)
+
+
+def chi2(block, mass: float, sigma: float):
+    return ((block.invariant_mass - mass) / sigma) ** 2
+
+
+register_feature("jet_multiplicity", lambda extractor: JetMultiplicity("jet_multiplicity"))
+register_feature("p_T", lambda extractor: JetStatistics("p_T", "p_T"))
+register_feature("eta", lambda extractor: JetStatistics("eta", "eta"))
+register_feature("phi", lambda extractor: JetStatistics("phi", "phi"))
+register_feature("delta_r", lambda extractor: DeltaR("delta_r"))
+register_feature("event_shape", lambda extractor: EventShape("event_shape"))
+register_feature("centrality", lambda extractor: Centrality("centrality"))
+register_feature("total_energy", lambda extractor: EventSum("total_energy"))
+register_feature("total_p_T", lambda extractor: EventSum("total_p_T"))
+register_feature(
+    "combined_invariant_mass", lambda extractor: CombinedInvariantMass("combined_invariant_mass")
+)
+register_feature("m2j", lambda extractor: CombinationFeature("m2j", 2, invariant_mass))
+register_feature("m3j", lambda extractor: CombinationFeature("m3j", 3, invariant_mass))
+register_feature("m6j", lambda extractor: CombinationFeature("m6j", 6, invariant_mass))
+register_feature(
+    "vector_sum_p_T_2j", lambda extractor: CombinationFeature("vector_sum_p_T_2j", 2, vector_sum_pt)
+)
+register_feature(
+    "vector_sum_p_T_3j", lambda extractor: CombinationFeature("vector_sum_p_T_3j", 3, vector_sum_pt)
+)
+register_feature(
+    "vector_sum_p_T_6j", lambda extractor: CombinationFeature("vector_sum_p_T_6j", 6, vector_sum_pt)
+)
+register_feature(
+    "n_jet_pairs_near_w_mass",
+    lambda extractor: CombinationCount("n_jet_pairs_near_w_mass", 2, near_w_mass),
+)
+register_feature(
+    "chi2_first_component",
+    lambda extractor: CombinationFeature(
+        "chi2_first_component", 2, functools.partial(chi2, mass=W_MASS, sigma=W_MASS_SIGMA)
+    ),
+)
+register_feature(
+    "chi2_second_component",
+    lambda extractor: CombinationFeature(
+        "chi2_second_component",
+        3,
+        functools.partial(chi2, mass=extractor.chi_mass, sigma=2 / 100 * extractor.chi_mass),
+    ),
+)
+register_feature(
+    "chi2_third_component",
+    lambda extractor: CombinationFeature(
+        "chi2_third_component",
+        6,
+        functools.partial(chi2, mass=extractor.suu_mass, sigma=SUU_MASS_SIGMA),
+    ),
+)
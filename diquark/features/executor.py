@@ -0,0 +1,339 @@
+import copy
+import functools
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import awkward as ak
+from tqdm.contrib.concurrent import thread_map, process_map
+
+from diquark.data.loader import DataLoader, merge_ranges
+from diquark.features.feature_extractor import FeatureExtractor
+
+
+def _worker_name() -> str:
+    return f"pid{os.getpid()}/{threading.current_thread().name}"
+
+
+def concatenate_features(parts: list[dict[str, np.ndarray]]) -> dict[str, np.ndarray]:
+    if len(parts) == 1:
+        return parts[0]
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def extract_dataset(data_loader: DataLoader, feature_extractor: FeatureExtractor, key: str,
+                    mass_cut: float = None, entry_start: int = None,
+                    entry_stop: int = None) -> tuple[dict[str, np.ndarray], dict]:
+    """Read one dataset (or an entry range of it) and extract its features, timing both phases."""
+    start = time.perf_counter()
+    extract_time = 0.0
+    groups = {}
+
+    def compute(arr: ak.Array) -> dict[str, np.ndarray]:
+        nonlocal extract_time
+        compute_start = time.perf_counter()
+        features = feature_extractor.compute_all(arr, timings=groups)
+        extract_time += time.perf_counter() - compute_start
+        return features
+
+    if data_loader.step_size is not None:
+        _, features = data_loader.stream_dataset(key, compute, mass_cut, entry_start, entry_stop)
+    else:
+        _, arr = data_loader.load_dataset(key, mass_cut, entry_start, entry_stop)
+        features = compute(arr)
+
+    total_time = time.perf_counter() - start
+    timing = {
+        "dataset": key,
+        "entry_start": entry_start,
+        "entry_stop": entry_stop,
+        "worker": _worker_name(),
+        "n_events": len(next(iter(features.values()))),
+        "read_s": total_time - extract_time,
+        "extract_s": extract_time,
+        "total_s": total_time,
+        "groups": groups,
+    }
+    return features, timing
+
+
+def stream_feature_batches(data_loader: DataLoader, feature_extractor: FeatureExtractor, key: str,
+                           mass_cut: float = None, transform=None) -> Iterator[np.ndarray]:
+    """Stream a dataset chunk by chunk as feature matrices, optionally transformed (e.g. scaled)."""
+    # Only one chunk of events is read at a time, whatever the loader's step size
+    if data_loader.step_size is None:
+        data_loader = copy.copy(data_loader)
+        data_loader.step_size = "100 MB"
+
+    for arr in data_loader.iterate_jet_delphes(
+        data_loader.path_dict[key], data_loader.branches_for(key, mass_cut)
+    ):
+        if key.startswith("SIG") and mass_cut is not None:
+            arr = data_loader.lower_cut_suu_mass(arr, mass_cut)
+
+        features = feature_extractor.compute_all(arr)
+        X = np.column_stack([features[name] for name in feature_extractor.feature_names])
+        yield transform(X) if transform is not None else X
+
+
+def _extract_dataset_to_disk(entry_range: tuple[str, int, int], data_loader: DataLoader,
+                             feature_extractor: FeatureExtractor, mass_cut: float,
+                             scratch_dir: str) -> tuple[str, dict[str, str], dict]:
+    """Process-pool task: write the feature columns as .npy files instead of pickling them back."""
+    key, entry_start, entry_stop = entry_range
+    features, timing = extract_dataset(
+        data_loader, feature_extractor, key, mass_cut, entry_start, entry_stop
+    )
+
+    dataset_dir = Path(scratch_dir) / f"{key.replace(':', '_')}_{entry_start}"
+    dataset_dir.mkdir(parents=True, exist_ok=True)
+
+    paths = {}
+    for name, column in features.items():
+        paths[name] = str(dataset_dir / f"{name}.npy")
+        np.save(paths[name], np.asarray(column))
+
+    return key, paths, timing
+
+
+class FeatureExecutor:
+    """Runs per-dataset feature extraction on a threads, processes, serial or pipeline backend.
+
+    The pipeline backend reads chunks of several datasets at once and hands
+    each one to the extraction threads as soon as it is decoded, so reads
+    and compute overlap within and across datasets.
+    """
+
+    BACKENDS = ("threads", "processes", "serial", "pipeline")
+
+    def __init__(self, data_loader: DataLoader, feature_extractor: FeatureExtractor,
+                 backend: str = "threads", max_workers: int = 32, scratch_dir: str = None,
+                 io_workers: int = 4, prefetch_chunks: int = None):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown feature extraction backend: {backend}")
+
+        self.data_loader = data_loader
+        self.feature_extractor = feature_extractor
+        self.backend = backend
+        self.max_workers = max_workers if backend != "serial" else 1
+        self.scratch_dir = scratch_dir
+        # Pipeline backend: datasets read concurrently, and chunks read but not yet extracted
+        self.io_workers = io_workers
+        self.prefetch_chunks = (
+            prefetch_chunks if prefetch_chunks is not None else 2 * self.max_workers
+        )
+        self.timings: list[dict] = []
+
+    def extract(self, data: dict[str, ak.Array]) -> dict[str, dict[str, np.ndarray]]:
+        """Extract features from datasets that are already loaded in memory."""
+
+        def compute(arr: ak.Array):
+            start = time.perf_counter()
+            groups = {}
+            features = self.feature_extractor.compute_all(arr, timings=groups)
+            elapsed = time.perf_counter() - start
+            return features, {
+                "worker": _worker_name(),
+                "n_events": len(arr),
+                "read_s": 0.0,
+                "extract_s": elapsed,
+                "total_s": elapsed,
+                "groups": groups,
+            }
+
+        results = thread_map(
+            compute, data.values(), max_workers=self.max_workers, desc="Extracting features"
+        )
+
+        features = {}
+        for key, (feature_dict, timing) in zip(data.keys(), results):
+            features[key] = feature_dict
+            self.timings.append({"dataset": key, **timing})
+        return features
+
+    def run(self, keys: list[str], mass_cut: float = None) -> dict[str, dict[str, np.ndarray]]:
+        """Read and extract the given datasets, each worker handling whole datasets or entry ranges.
+
+        The ranges come from DataLoader.plan, largest first, so big files
+        neither run last nor alone.
+        """
+        ranges = self.data_loader.plan(keys, mass_cut)
+        if self.backend == "processes":
+            return self._run_processes(keys, ranges, mass_cut)
+        if self.backend == "pipeline":
+            return self._run_pipeline(keys, ranges, mass_cut)
+
+        def extract(entry_range: tuple[str, int, int]) -> tuple[dict[str, np.ndarray], dict]:
+            key, entry_start, entry_stop = entry_range
+            return extract_dataset(
+                self.data_loader, self.feature_extractor, key, mass_cut, entry_start, entry_stop
+            )
+
+        results = thread_map(
+            extract, ranges, max_workers=self.max_workers, desc="Extracting features"
+        )
+
+        self.timings.extend(timing for _, timing in results)
+        return merge_ranges(
+            keys, ranges, [features for features, _ in results], concatenate_features
+        )
+
+    def _run_processes(self, keys: list[str], ranges: list[tuple[str, int, int]],
+                       mass_cut: float = None) -> dict[str, dict[str, np.ndarray]]:
+        scratch_dir = tempfile.mkdtemp(prefix="diquark-features-", dir=self.scratch_dir)
+        try:
+            extract = functools.partial(
+                _extract_dataset_to_disk,
+                data_loader=self.data_loader,
+                feature_extractor=self.feature_extractor,
+                mass_cut=mass_cut,
+                scratch_dir=scratch_dir,
+            )
+            results = process_map(
+                extract, ranges, max_workers=self.max_workers, desc="Extracting features"
+            )
+
+            # Memory-mapped columns stay valid after their files are unlinked
+            parts = [
+                {name: np.load(path, mmap_mode="r") for name, path in paths.items()}
+                for _, paths, _ in results
+            ]
+            self.timings.extend(timing for _, _, timing in results)
+            return merge_ranges(keys, ranges, parts, concatenate_features)
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    def _run_pipeline(self, keys: list[str], ranges: list[tuple[str, int, int]],
+                      mass_cut: float = None) -> dict[str, dict[str, np.ndarray]]:
+        """Read the ranges chunk by chunk on io_workers threads, extracting chunks on max_workers.
+
+        Readers block once prefetch_chunks chunks are waiting for or in
+        extraction, which bounds the memory held by decoded chunks.
+        """
+        data_loader = self.data_loader
+        if data_loader.step_size is None:
+            data_loader = copy.copy(data_loader)
+            data_loader.step_size = "100 MB"
+
+        slots = threading.BoundedSemaphore(self.prefetch_chunks)
+        failed = threading.Event()
+
+        def compute(arr: ak.Array) -> tuple[dict[str, np.ndarray], dict]:
+            try:
+                start = time.perf_counter()
+                groups = {}
+                features = self.feature_extractor.compute_all(arr, timings=groups)
+                end = time.perf_counter()
+                return features, {"extract_s": end - start, "end": end, "groups": groups}
+            finally:
+                slots.release()
+
+        def on_done(future: Future):
+            if future.exception() is not None:
+                failed.set()
+
+        def read(
+            entry_range: tuple[str, int, int], extract_pool: ThreadPoolExecutor
+        ) -> tuple[list[Future], dict]:
+            key, entry_start, entry_stop = entry_range
+            start = time.perf_counter()
+            read_time = 0.0
+            futures = []
+
+            def submit(arr: ak.Array):
+                slots.acquire()
+                future = extract_pool.submit(compute, arr)
+                future.add_done_callback(on_done)
+                futures.append(future)
+
+            try:
+                chunks = data_loader.iterate_jet_delphes(
+                    data_loader.path_dict[key],
+                    data_loader.branches_for(key, mass_cut),
+                    entry_start,
+                    entry_stop,
+                )
+                while not failed.is_set():
+                    read_start = time.perf_counter()
+                    arr = next(chunks, None)
+                    if arr is not None and key.startswith("SIG") and mass_cut is not None:
+                        arr = data_loader.lower_cut_suu_mass(arr, mass_cut)
+                    read_time += time.perf_counter() - read_start
+                    if arr is None:
+                        break
+
+                    submit(arr)
+
+                if not futures and not failed.is_set():
+                    # A range past the file's entries yields no chunks, so extract its empty read
+                    # to get the same typed empty columns as the other backends
+                    read_start = time.perf_counter()
+                    _, arr = data_loader.load_dataset(key, mass_cut, entry_start, entry_stop)
+                    read_time += time.perf_counter() - read_start
+                    submit(arr)
+            except BaseException:
+                failed.set()
+                raise
+
+            return futures, {"dataset": key, "entry_start": entry_start, "entry_stop": entry_stop,
+                             "worker": _worker_name(), "start": start, "read_s": read_time}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as extract_pool:
+            read = functools.partial(read, extract_pool=extract_pool)
+            results = thread_map(
+                read, ranges, max_workers=self.io_workers, desc="Extracting features"
+            )
+
+            # Ranges cut short by a failed extraction have no chunks, so raise its error first
+            for futures, _ in results:
+                for future in futures:
+                    future.result()
+
+            parts = []
+            for futures, timing in results:
+                chunks = [future.result() for future in futures]
+                parts.append({name: np.concatenate([chunk[name] for chunk, _ in chunks])
+                              for name in self.feature_extractor.feature_names})
+
+                groups = {}
+                for _, chunk_timing in chunks:
+                    for group, seconds in chunk_timing["groups"].items():
+                        groups[group] = groups.get(group, 0.0) + seconds
+                start = timing.pop("start")
+                self.timings.append({
+                    **timing,
+                    "n_events": len(next(iter(parts[-1].values()))),
+                    "extract_s": sum(chunk_timing["extract_s"] for _, chunk_timing in chunks),
+                    # Reads and extraction overlap, so this is less than their sum
+                    "total_s": max(chunk_timing["end"] for _, chunk_timing in chunks) - start,
+                    "groups": groups,
+                })
+
+        return merge_ranges(keys, ranges, parts, concatenate_features)
+
+    def worker_summary(self) -> dict[str, dict]:
+        """Aggregate the recorded dataset timings per worker."""
+        summary = {}
+        for timing in self.timings:
+            worker = summary.setdefault(
+                timing["worker"],
+                {"datasets": 0, "n_events": 0, "read_s": 0.0, "extract_s": 0.0, "total_s": 0.0},
+            )
+            worker["datasets"] += 1
+            for field in ("n_events", "read_s", "extract_s", "total_s"):
+                worker[field] += timing[field]
+        return summary
+
+    def group_summary(self) -> dict[str, float]:
+        """Seconds spent on each feature group, summed over the recorded datasets."""
+        summary = {}
+        for timing in self.timings:
+            for group, seconds in timing.get("groups", {}).items():
+                summary[group] = summary.get(group, 0.0) + seconds
+        return summary
@@ -0,0 +1,193 @@
+import functools
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+import numpy as np
+import awkward as ak
+
+from diquark.features.combinations import JetCombinations
+from diquark.features.reductions import RunningStatistics
+
+# Delphes branches the store reads its jet quantities from
+BRANCHES = {
+    "num_jets": "Jet",
+    "p_T": "Jet/Jet.PT",
+    "eta": "Jet/Jet.Eta",
+    "phi": "Jet/Jet.Phi",
+}
+# Everything derived from the jets' kinematics (momenta, energies, combinations) needs all three
+JET_KINEMATICS = [BRANCHES["p_T"], BRANCHES["eta"], BRANCHES["phi"]]
+
+
+class IntermediateStore:
+    """Arrays shared by the features of one chunk of events, each computed at most once.
+
+    Intermediates are built on first use, so only those the selected features
+    need are ever computed. The k-jet combination observables of all features
+    are reduced together, in a single pass over the combinations for each k.
+    When `timings` is given, the seconds spent on each feature and
+    intermediate are added to it, excluding time spent in nested ones.
+    """
+
+    def __init__(
+        self,
+        data: ak.Array,
+        n_jets: int,
+        combination_block_size: int = 2**20,
+        combination_observables: dict[int, dict[str, Callable]] = None,
+        timings: dict = None,
+    ):
+        self.data = data
+        self.n_jets = n_jets
+        self.combination_block_size = combination_block_size
+        self.combination_observables = combination_observables or {}
+        self.timings = timings
+
+        self._combination_statistics: dict[int, dict[str, RunningStatistics]] = {}
+        self._nested_seconds: list[float] = []
+
+    @contextmanager
+    def timed(self, name: str):
+        if self.timings is None:
+            yield
+            return
+
+        self._nested_seconds.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._nested_seconds.pop()
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed - nested
+            if self._nested_seconds:
+                self._nested_seconds[-1] += elapsed
+
+    def pad(self, array: ak.Array) -> np.ndarray:
+        """(n_events, n_jets) matrix of the leading jets' values, zero-filled."""
+        padded = ak.pad_none(array, self.n_jets, clip=True)
+        filled = ak.fill_none(padded, 0.0)
+        return filled.to_numpy()
+
+    # Jets
+
+    @functools.cached_property
+    def num_jets(self) -> np.ndarray:
+        return ak.to_numpy(self.data[BRANCHES["num_jets"]])
+
+    @functools.cached_property
+    def non_zero_jets(self) -> np.ndarray:
+        return self.num_jets > 0
+
+    @functools.cached_property
+    def p_T(self) -> ak.Array:
+        return self.data[BRANCHES["p_T"]]
+
+    @functools.cached_property
+    def eta(self) -> ak.Array:
+        return self.data[BRANCHES["eta"]]
+
+    @functools.cached_property
+    def phi(self) -> ak.Array:
+        return self.data[BRANCHES["phi"]]
+
+    @functools.cached_property
+    def padded_p_T(self) -> np.ndarray:
+        with self.timed("padding"):
+            return self.pad(self.p_T)
+
+    @functools.cached_property
+    def padded_eta(self) -> np.ndarray:
+        with self.timed("padding"):
+            return self.pad(self.eta)
+
+    @functools.cached_property
+    def padded_phi(self) -> np.ndarray:
+        with self.timed("padding"):
+            return self.pad(self.phi)
+
+    # Cartesian momenta and energies
+
+    @functools.cached_property
+    def p_x(self) -> ak.Array:
+        with self.timed("momenta"):
+            return self.p_T * np.cos(self.phi)
+
+    @functools.cached_property
+    def p_y(self) -> ak.Array:
+        with self.timed("momenta"):
+            return self.p_T * np.sin(self.phi)
+
+    @functools.cached_property
+    def p_z(self) -> ak.Array:
+        with self.timed("momenta"):
+            return self.p_T * np.sinh(self.eta)
+
+    @functools.cached_property
+    def energy(self) -> ak.Array:
+        with self.timed("energy"):
+            return self.p_T * np.cosh(self.eta)
+
+    @functools.cached_property
+    def padded_p_x(self) -> np.ndarray:
+        with self.timed("padding"):
+            return self.pad(self.p_x)
+
+    @functools.cached_property
+    def padded_p_y(self) -> np.ndarray:
+        with self.timed("padding"):
+            return self.pad(self.p_y)
+
+    @functools.cached_property
+    def padded_p_z(self) -> np.ndarray:
+        with self.timed("padding"):
+            return self.pad(self.p_z)
+
+    @functools.cached_property
+    def padded_energy(self) -> np.ndarray:
+        with self.timed("padding"):
+            return self.pad(self.energy)
+
+    @functools.cached_property
+    def total_energy(self) -> np.ndarray:
+        with self.timed("energy_sums"):
+            return ak.sum(self.energy, axis=-1).to_numpy()
+
+    @functools.cached_property
+    def total_p_T(self) -> np.ndarray:
+        with self.timed("energy_sums"):
+            return ak.sum(self.p_T, axis=-1).to_numpy()
+
+    # k-jet combinations
+
+    @functools.cached_property
+    def combinations(self) -> JetCombinations:
+        """Combinations of the leading jets, with index tables cached per (n_jets, k) in-process."""
+        jets = {
+            "p_x": self.padded_p_x,
+            "p_y": self.padded_p_y,
+            "p_z": self.padded_p_z,
+            "energy": self.padded_energy,
+        }
+        with self.timed("combination_inputs"):
+            n_valid = np.minimum(ak.num(self.p_T, axis=-1).to_numpy(), self.n_jets)
+            return JetCombinations(jets, n_valid, max_block_size=self.combination_block_size)
+
+    def combination_statistics(self, k: int) -> dict[str, RunningStatistics]:
+        """Statistics of every registered k-jet observable, reduced block by block in one pass."""
+        if k not in self._combination_statistics:
+            observables = self.combination_observables.get(k, {})
+            combinations = self.combinations
+
+            with self.timed(f"combinations_{k}j"):
+                statistics = {
+                    name: RunningStatistics(combinations.n_events) for name in observables
+                }
+                for index, block in combinations.blocks(k):
+                    for name, observable in observables.items():
+                        statistics[name].update(index, observable(block))
+
+            self._combination_statistics[k] = statistics
+
+        return self._combination_statistics[k]
@@ -0,0 +1,90 @@
+import numpy as np
+import awkward as ak
+
+
+class RunningStatistics:
+    """Per-event min/mean/stddev/max accumulated over blocks of values.
+
+    Blocks are merged with Chan's parallel update of the sum of squared
+    deviations, so the full set of values never has to be held in memory.
+    """
+
+    def __init__(self, n_events: int):
+        self.count = np.zeros(n_events, dtype=np.int64)
+        self.sum = np.zeros(n_events, dtype=np.float64)
+        self.m2 = np.zeros(n_events, dtype=np.float64)
+        self.min = np.full(n_events, np.inf, dtype=np.float64)
+        self.max = np.full(n_events, -np.inf, dtype=np.float64)
+
+    @classmethod
+    def from_lists(cls, data: ak.Array | np.ndarray) -> "RunningStatistics":
+        """Statistics of each list of a jagged (or regular 2D) array, in one call.
+
+        Works directly on the flat content and list boundaries, so every
+        statistic shares the same contiguous buffer instead of re-walking the
+        jagged layout and building a masked array per statistic.
+        """
+        if isinstance(data, np.ndarray):
+            counts = np.full(data.shape[0], data.shape[1], dtype=np.int64)
+            content = data.reshape(-1)
+        else:
+            counts = ak.num(data, axis=-1).to_numpy().astype(np.int64)
+            content = ak.flatten(data, axis=-1).to_numpy()
+
+        stats = cls(len(counts))
+        filled = counts > 0
+        if not filled.any():
+            return stats
+
+        # Non-empty lists are contiguous in the content, so their start offsets
+        # partition it exactly
+        starts = (np.cumsum(counts) - counts)[filled]
+
+        # One float64 scratch copy of the content is reused for the centred squares
+        scratch = content.astype(np.float64)
+        sums = np.add.reduceat(scratch, starts)
+        np.subtract(scratch, np.repeat(sums / counts[filled], counts[filled]), out=scratch)
+        np.multiply(scratch, scratch, out=scratch)
+
+        stats.count = counts
+        stats.sum[filled] = sums
+        stats.m2[filled] = np.add.reduceat(scratch, starts)
+        stats.min[filled] = np.minimum.reduceat(content, starts)
+        stats.max[filled] = np.maximum.reduceat(content, starts)
+        return stats
+
+    def update(self, index: np.ndarray, values: np.ndarray):
+        """Merge a (len(index), n_values) block of values into the given events."""
+        n_b = values.shape[1]
+        if n_b == 0:
+            return
+
+        sum_b = values.sum(axis=1, dtype=np.float64)
+        mean_b = sum_b / n_b
+        m2_b = ((values - mean_b[:, None]) ** 2).sum(axis=1)
+
+        n_a = self.count[index]
+        sum_a = self.sum[index]
+        mean_a = np.divide(sum_a, n_a, out=np.zeros_like(sum_a), where=n_a > 0)
+        n = n_a + n_b
+
+        self.m2[index] += m2_b + (mean_b - mean_a) ** 2 * n_a * n_b / n
+        self.sum[index] = sum_a + sum_b
+        self.count[index] = n
+        self.min[index] = np.minimum(self.min[index], values.min(axis=1))
+        self.max[index] = np.maximum(self.max[index], values.max(axis=1))
+
+    def flatten(self, name: str) -> dict[str, np.ndarray]:
+        """Return the statistics as feature columns, zero-filled for empty events."""
+        filled = self.count > 0
+        zeros = np.zeros_like(self.sum)
+
+        mean = np.divide(self.sum, self.count, out=zeros.copy(), where=filled)
+        variance = np.divide(self.m2, self.count, out=zeros.copy(), where=filled)
+
+        return {
+            f"{name}_min": np.where(filled, self.min, 0.0),
+            f"{name}_mean": mean,
+            f"{name}_stddev": np.sqrt(variance),
+            f"{name}_max": np.where(filled, self.max, 0.0),
+        }
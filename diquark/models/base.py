@@ -1,8 +1,15 @@
+import os
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 import numpy as np
-from typing import Any, Dict
+from typing import Any, Dict, Iterable
 
 class BaseModel(ABC):
+    # Extension of the files written by save
+    model_file_suffix = ''
+
     def __init__(self, name: str, config: Dict[str, Any]):
         self.name = name
         self.config = config
@@ -14,8 +21,9 @@ class BaseModel(ABC):
         pass
 
     @abstractmethod
-    def train(self, X_train: np.ndarray, y_train: np.ndarray, X_val: np.ndarray, y_val: np.ndarray):
-        """Train the model."""
+    def train(self, X_train: np.ndarray, y_train: np.ndarray, X_val: np.ndarray, y_val: np.ndarray,
+              sample_weight: np.ndarray = None):
+        """Train the model, optionally weighting the training events."""
         pass
 
     @abstractmethod
@@ -23,6 +31,37 @@ class BaseModel(ABC):
         """Make predictions using the trained model."""
         pass
 
+    def predict_batched(self, batches: Iterable[np.ndarray], output_path: str, n_events: int = None,
+                        max_workers: int = 4) -> Path:
+        """Score feature batches in parallel, writing the scores as they come to a .npy or .parquet.
+
+        At most 2 * max_workers batches are in memory at once, however many
+        events are scored. Scores are written in batch order. A .npy output
+        is a memory map of n_events scores; without n_events the scores are
+        spooled to a raw file first.
+        """
+        output_path = Path(output_path)
+        if output_path.suffix not in ('.npy', '.parquet'):
+            raise ValueError(f"Unsupported output format: {output_path.suffix}")
+
+        writer = _ScoreWriter(output_path, n_events)
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                pending = deque()
+                for batch in batches:
+                    pending.append(executor.submit(self.predict, batch))
+                    if len(pending) >= 2 * max_workers:
+                        writer.write(pending.popleft().result())
+
+                while pending:
+                    writer.write(pending.popleft().result())
+        finally:
+            writer.close()
+
+        if n_events is not None and writer.n_written != n_events:
+            raise ValueError(f"Scored {writer.n_written} events, expected {n_events}")
+        return output_path
+
     @abstractmethod
     def save(self, path: str):
         """Save the trained model."""
@@ -31,4 +70,60 @@ class BaseModel(ABC):
     @abstractmethod
     def load(self, path: str):
         """Load a trained model."""
-        pass
\ No newline at end of file
+        pass
+
+
+class _ScoreWriter:
+    """Appends score batches to a .npy memory map or a Parquet file."""
+
+    def __init__(self, path: Path, n_events: int = None):
+        self.path = path
+        self.n_events = n_events
+        self.n_written = 0
+
+        if path.suffix == '.parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            self.schema = pa.schema([('score', pa.float64())])
+            self.parquet = pq.ParquetWriter(path, self.schema)
+        elif n_events is not None:
+            self.scores = np.lib.format.open_memmap(
+                path, mode='w+', dtype=np.float64, shape=(n_events,)
+            )
+        else:
+            self.raw_path = path.with_suffix('.raw.tmp')
+            self.raw = open(self.raw_path, 'wb')
+
+    def write(self, scores: np.ndarray):
+        scores = np.asarray(scores, dtype=np.float64)
+        if self.path.suffix == '.parquet':
+            import pyarrow as pa
+            self.parquet.write_table(pa.table({'score': scores}, schema=self.schema))
+        elif self.n_events is not None:
+            if self.n_written + len(scores) > self.n_events:
+                raise ValueError(f"More than the expected {self.n_events} events were scored")
+            self.scores[self.n_written:self.n_written + len(scores)] = scores
+        else:
+            scores.tofile(self.raw)
+        self.n_written += len(scores)
+
+    def close(self):
+        if self.path.suffix == '.parquet':
+            self.parquet.close()
+        elif self.n_events is not None:
+            self.scores.flush()
+            del self.scores
+        else:
+            self.raw.close()
+            raw = (
+                np.memmap(self.raw_path, dtype=np.float64, mode='r')
+                if self.n_written
+                else np.empty(0)
+            )
+            scores = np.lib.format.open_memmap(
+                self.path, mode='w+', dtype=np.float64, shape=(self.n_written,)
+            )
+            scores[:] = raw
+            scores.flush()
+            del scores, raw
+            os.remove(self.raw_path)
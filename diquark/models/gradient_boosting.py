@@ -4,6 +4,8 @@ from diquark.models.base import BaseModel
 from typing import Any
 
 class GradientBoostingModel(BaseModel):
+    model_file_suffix = '.json'
+
     def __init__(self, config: dict[str, Any]):
         super().__init__("GradientBoosting", config)
         self.n_estimators = self.config.get('n_estimators', 100)
@@ -12,8 +14,12 @@ class GradientBoostingModel(BaseModel):
         self.subsample = self.config.get('subsample', 1.0)
         self.colsample_bytree = self.config.get('colsample_bytree', 1.0)
         self.random_state = self.config.get('random_state', 42)
+        self.n_jobs = self.config.get('n_jobs', None)
+        self.input_shape = None
+        self.init_model = None
 
     def build(self, input_shape: int):
+        self.input_shape = input_shape
         self.model = xgb.XGBClassifier(
             n_estimators=self.n_estimators,
             learning_rate=self.learning_rate,
@@ -21,18 +27,26 @@ class GradientBoostingModel(BaseModel):
             subsample=self.subsample,
             colsample_bytree=self.colsample_bytree,
             random_state=self.random_state,
+            n_jobs=self.n_jobs,
             tree_method="hist",
             early_stopping_rounds=2
         )
 
-    def train(self, X_train: np.ndarray, y_train: np.ndarray, X_val: np.ndarray, y_val: np.ndarray):
+    def train(self, X_train: np.ndarray, y_train: np.ndarray, X_val: np.ndarray, y_val: np.ndarray,
+              sample_weight: np.ndarray = None):
         self.model.fit(
             X_train, y_train,
+            sample_weight=sample_weight,
+            xgb_model=self.init_model,
             eval_set=[(X_val, y_val)],
             verbose=True
         )
         return self.model.evals_result()
 
+    def warm_start(self, previous: "GradientBoostingModel"):
+        """Continue boosting from the trees of another trained model instead of from scratch."""
+        self.init_model = previous.model.get_booster()
+
     def predict(self, X: np.ndarray) -> np.ndarray:
         return self.model.predict_proba(X)[:, 1]
 
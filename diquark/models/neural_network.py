@@ -5,6 +5,8 @@ from diquark.models.base import BaseModel
 from typing import Any
 
 class NeuralNetworkModel(BaseModel):
+    model_file_suffix = '.keras'
+
     def __init__(self, config: dict[str, Any]):
         super().__init__("NeuralNetwork", config)
         self.epochs = self.config.get('epochs', 100)
@@ -28,9 +30,11 @@ class NeuralNetworkModel(BaseModel):
         optimizer = optimizers.Adam(learning_rate=self.learning_rate)
         self.model.compile(optimizer=optimizer, loss="binary_crossentropy", metrics=["accuracy"])
 
-    def train(self, X_train: np.ndarray, y_train: np.ndarray, X_val: np.ndarray, y_val: np.ndarray):
+    def train(self, X_train: np.ndarray, y_train: np.ndarray, X_val: np.ndarray, y_val: np.ndarray,
+              sample_weight: np.ndarray = None):
         history = self.model.fit(
             X_train, y_train,
+            sample_weight=sample_weight,
             epochs=self.epochs,
             batch_size=self.batch_size,
             validation_data=(X_val, y_val),
@@ -5,6 +5,8 @@ from diquark.models.base import BaseModel
 from typing import Any
 
 class RandomForestModel(BaseModel):
+    model_file_suffix = '.joblib'
+
     def __init__(self, config: dict[str, Any]):
         super().__init__("RandomForest", config)
         self.n_estimators = self.config.get('n_estimators', 100)
@@ -12,6 +14,7 @@ class RandomForestModel(BaseModel):
         self.min_samples_split = self.config.get('min_samples_split', 2)
         self.min_samples_leaf = self.config.get('min_samples_leaf', 1)
         self.random_state = self.config.get('random_state', 42)
+        self.n_jobs = self.config.get('n_jobs', -1)
 
     def build(self, input_shape: int):
         self.model = RandomForestClassifier(
@@ -20,11 +23,12 @@ class RandomForestModel(BaseModel):
             min_samples_split=self.min_samples_split,
             min_samples_leaf=self.min_samples_leaf,
             random_state=self.random_state,
-            n_jobs=-1
+            n_jobs=self.n_jobs
         )
 
-    def train(self, X_train: np.ndarray, y_train: np.ndarray, X_val: np.ndarray, y_val: np.ndarray):
-        self.model.fit(X_train, y_train)
+    def train(self, X_train: np.ndarray, y_train: np.ndarray, X_val: np.ndarray, y_val: np.ndarray,
+              sample_weight: np.ndarray = None):
+        self.model.fit(X_train, y_train, sample_weight=sample_weight)
         train_score = self.model.score(X_train, y_train)
         val_score = self.model.score(X_val, y_val)
         return {"train_score": train_score, "val_score": val_score}
@@ -0,0 +1,327 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from tqdm.contrib.concurrent import thread_map
+
+from diquark.analysis import Analysis, create_sweep_logger, dataset_key
+from diquark.config import constants
+
+
+def stage_key(stage: str, *inputs) -> str:
+    """Hash a stage name together with everything its output depends on."""
+    encoded = json.dumps([stage, *inputs], sort_keys=True, default=str).encode()
+    return f"{stage}:{hashlib.sha256(encoded).hexdigest()[:16]}"
+
+
+class StageCache:
+    """Runs each distinct stage once, however many configs ask for it.
+
+    A result is kept until every consumer announced with `expect` has called
+    `release`, so shared intermediates only live as long as they are needed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.futures: dict[str, Future] = {}
+        self.pending = Counter()
+        self.timings: dict[str, dict] = {}
+
+    def expect(self, key: str):
+        self.pending[key] += 1
+
+    def run(self, key: str, compute, requester: str):
+        with self.lock:
+            future = self.futures.get(key)
+            owner = future is None
+            if owner:
+                future = self.futures[key] = Future()
+                self.timings[key] = {"stage": key.split(":")[0], "key": key, "config": requester,
+                                     "seconds": None, "reused": 0}
+            else:
+                self.timings[key]["reused"] += 1
+
+        if owner:
+            start = time.perf_counter()
+            try:
+                future.set_result(compute())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                self.timings[key]["seconds"] = time.perf_counter() - start
+
+        return future.result()
+
+    def release(self, key: str):
+        with self.lock:
+            self.pending[key] -= 1
+            if self.pending[key] <= 0:
+                self.futures.pop(key, None)
+
+
+class StagedSweep:
+    """Runs many configs as one graph of load, extract, split, prepare, train and evaluate stages.
+
+    Each stage is keyed by a hash of its inputs, so configs that only differ
+    downstream (e.g. in n_jets, models or thresholds) share everything
+    upstream of the difference. Configs run concurrently on a local worker
+    pool and wait on each other's stages instead of recomputing them.
+    Datasets are read and extracted whole on threads, whatever the configured
+    feature extraction backend; only evaluation runs once per config.
+    """
+
+    def __init__(self, config_paths: list[str], max_workers: int = 4):
+        self.config_paths = config_paths
+        self.max_workers = max_workers
+        self.n_jobs = max(1, (os.cpu_count() or 1) // max_workers)
+
+        self.stages = StageCache()
+        self.analyses = [Analysis(config_path) for config_path in config_paths]
+        self.logger = create_sweep_logger(self.analyses[0].config)
+        self.plans = [self.plan(analysis) for analysis in self.analyses]
+        self.announce_consumers()
+
+    def plan(self, analysis: Analysis) -> dict:
+        """Stage keys of one config, derived from its settings alone."""
+        datasets = list(dict.fromkeys(constants.DATA_KEYS))
+        preprocessing = analysis.config.get('preprocessing', {})
+
+        load = {
+            key: stage_key("load", dataset_key(analysis.config, analysis.path_dict, key))
+            for key in datasets
+        }
+        extract = {
+            key: stage_key("extract", load[key], analysis.feature_extractor.parameters())
+            for key in datasets
+        }
+        split = stage_key("split", [extract[key] for key in datasets], analysis.compact,
+                          analysis.use_cross_validation, analysis.n_folds,
+                          analysis.preprocessor.test_size, analysis.preprocessor.random_state)
+
+        folds = list(range(1, analysis.n_folds + 1)) if analysis.use_cross_validation else [0]
+        prepare = {fold: stage_key("prepare", split, fold, preprocessing) for fold in folds}
+        train = {
+            (fold, model_name): stage_key(
+                "train", prepare[fold], model_name, analysis.config.get(f'models.{model_name}')
+            )
+            for fold in folds
+            for model_name, model in analysis.models.items()
+            if model is not None
+        }
+
+        return {"datasets": datasets, "load": load, "extract": extract, "split": split,
+                "folds": folds, "prepare": prepare, "train": train}
+
+    def announce_consumers(self):
+        # Every distinct stage consumes its inputs once, however many configs share it
+        consumed = {}
+        for plan in self.plans:
+            for key in plan["datasets"]:
+                consumed[plan["extract"][key]] = [plan["load"][key]]
+            consumed[plan["split"]] = list(plan["extract"].values())
+            for fold in plan["folds"]:
+                consumed[plan["prepare"][fold]] = [plan["split"]]
+            for (fold, _), train_key in plan["train"].items():
+                consumed[train_key] = [plan["prepare"][fold]]
+
+        for inputs in consumed.values():
+            for key in inputs:
+                self.stages.expect(key)
+
+        # Evaluation is per config
+        for plan in self.plans:
+            for key in [plan["split"], *plan["train"].values()]:
+                self.stages.expect(key)
+
+    def load(self, analysis: Analysis, plan: dict, key: str):
+        def compute():
+            _, arr = analysis.data_loader.load_dataset(key, analysis.config.get('data.mass_cut'))
+            return arr
+
+        return self.stages.run(plan["load"][key], compute, str(analysis.config.config_path))
+
+    def extract(self, analysis: Analysis, plan: dict, key: str):
+        def compute():
+            try:
+                if analysis.feature_cache is not None:
+                    cached = analysis.feature_cache.get(analysis.feature_cache_key(key))
+                    if cached is not None:
+                        return cached
+
+                features = analysis.feature_extractor.compute_all(self.load(analysis, plan, key))
+                analysis.store_cached_features({key: features})
+                return features
+            finally:
+                self.stages.release(plan["load"][key])
+
+        return self.stages.run(plan["extract"][key], compute, str(analysis.config.config_path))
+
+    def split(self, analysis: Analysis, plan: dict):
+        def compute():
+            try:
+                datasets = plan["datasets"]
+                extracted = thread_map(
+                    lambda key: self.extract(analysis, plan, key),
+                    datasets,
+                    max_workers=analysis.feature_executor.max_workers,
+                    desc="Extracting features",
+                )
+                features = dict(zip(datasets, extracted))
+                analysis.check_features(features)
+
+                if analysis.compact:
+                    data = analysis.preprocessor.create_feature_matrix(features)
+                    target, truth = data.target, data.truth()
+                else:
+                    data = analysis.preprocessor.create_dataframe(features)
+                    target, truth = data['target'].to_numpy(), data['Truth']
+
+                if analysis.use_cross_validation:
+                    folds = dict(analysis.fold_indices(truth))
+                else:
+                    folds = {0: analysis.preprocessor.split_indices(target)}
+                return data, folds
+            finally:
+                for key in plan["datasets"]:
+                    self.stages.release(plan["extract"][key])
+
+        return self.stages.run(plan["split"], compute, str(analysis.config.config_path))
+
+    def prepare(self, analysis: Analysis, plan: dict, fold: int):
+        def compute():
+            try:
+                data, folds = self.split(analysis, plan)
+                train_index, test_index = folds[fold]
+
+                preprocessor = copy.deepcopy(analysis.preprocessor)
+                if analysis.compact:
+                    X_train, X_test, y_train, y_test = preprocessor.prepare_matrix_data(
+                        data, train_index, test_index
+                    )
+                else:
+                    df_train, df_test = data.iloc[train_index], data.iloc[test_index]
+                    X_train, X_test, y_train, y_test, _, _ = preprocessor.prepare_fold_data(
+                        df_train.drop(["target", "Truth"], axis=1),
+                        df_test.drop(["target", "Truth"], axis=1),
+                        df_train["target"],
+                        df_test["target"],
+                        df_train,
+                        df_test,
+                    )
+                return X_train, X_test, y_train, y_test, preprocessor
+            finally:
+                self.stages.release(plan["split"])
+
+        return self.stages.run(plan["prepare"][fold], compute, str(analysis.config.config_path))
+
+    def train(self, analysis: Analysis, plan: dict, fold: int, model_name: str):
+        def compute():
+            try:
+                X_train, X_test, y_train, y_test, preprocessor = self.prepare(analysis, plan, fold)
+                model = analysis.create_models(self.n_jobs)[model_name]
+                trained = analysis.train_model(model_name, model, X_train, X_test, y_train, y_test,
+                                               preprocessor.sample_weights(y_train))
+                return {**trained, 'model': model, 'scaler': preprocessor.scaler}
+            finally:
+                self.stages.release(plan["prepare"][fold])
+
+        return self.stages.run(
+            plan["train"][(fold, model_name)], compute, str(analysis.config.config_path)
+        )
+
+    def evaluate(self, analysis: Analysis, plan: dict):
+        """Evaluate, plot and save the results of one config from the shared stages."""
+        try:
+            data, folds = self.split(analysis, plan)
+
+            all_fold_results = []
+            for fold, (_, test_index) in folds.items():
+                trained = {model_name: self.train(analysis, plan, fold, model_name)
+                           for train_fold, model_name in plan["train"] if train_fold == fold}
+
+                if analysis.compact:
+                    df_test = data.to_dataframe(test_index)
+                else:
+                    df_test = data.iloc[test_index]
+
+                results = {
+                    model_name: analysis.evaluate_predictions(model_trained, df_test['Truth'])
+                    for model_name, model_trained in trained.items()
+                }
+
+                results_dir = (
+                    analysis.results_manager.create_subdir(f"fold_{fold}") if fold else None
+                )
+                analysis.visualize_results(results, df_test, results_dir)
+                analysis.save_results(results, df_test, results_dir)
+                all_fold_results.append(results)
+
+                if trained:
+                    # All models of a fold share the fold's scaler
+                    scaler = next(iter(trained.values()))['scaler']
+                    models = {
+                        model_name: model_trained['model']
+                        for model_name, model_trained in trained.items()
+                    }
+                    analysis.save_fold_models(fold, models, scaler, results_dir)
+
+            if analysis.use_cross_validation:
+                analysis.summarize_cross_validation_results(all_fold_results)
+            analysis.save_model_manifest()
+        finally:
+            for key in [plan["split"], *plan["train"].values()]:
+                self.stages.release(key)
+
+    def run(self) -> dict:
+        def run_config(i):
+            analysis, plan = self.analyses[i], self.plans[i]
+            analysis.logger.info("Starting analysis (staged sweep)...")
+
+            start = time.perf_counter()
+            with analysis.profiler.stage('run'):
+                self.evaluate(analysis, plan)
+            analysis.save_timings()
+            analysis.logger.info("Analysis completed.")
+            return {"config": self.config_paths[i], "seconds": time.perf_counter() - start}
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            config_timings = list(executor.map(run_config, range(len(self.analyses))))
+        total = time.perf_counter() - start
+
+        return self.report(config_timings, total)
+
+    def report(self, config_timings: list[dict], total: float) -> dict:
+        """Summarize how often each kind of stage ran and was reused, and how long it took."""
+        stage_timings = list(self.stages.timings.values())
+
+        summary = {}
+        for timing in stage_timings:
+            stage = summary.setdefault(timing["stage"], {"runs": 0, "reused": 0, "seconds": 0.0})
+            stage["runs"] += 1
+            stage["reused"] += timing["reused"]
+            stage["seconds"] += timing["seconds"] or 0.0
+
+        # Stages run inline in their consumers, so times include waiting on their own inputs
+        for stage, stage_summary in summary.items():
+            self.logger.info(
+                f"{stage:>8}: {stage_summary['runs']} run, {stage_summary['reused']} reused, "
+                f"{stage_summary['seconds']:.1f}s"
+            )
+        self.logger.info(
+            f"Sweep of {len(config_timings)} configs took {total:.1f}s "
+            f"on {self.max_workers} workers"
+        )
+
+        return {
+            "configs": config_timings,
+            "stages": stage_timings,
+            "summary": summary,
+            "total_seconds": total,
+            "max_workers": self.max_workers,
+        }
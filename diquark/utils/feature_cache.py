@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+
+class FeatureCache:
+    """Content-addressed on-disk cache of per-dataset feature columns.
+
+    Entries are Parquet files named by a hash of everything that determines
+    the features of a dataset. The cache is bounded in size and evicts the
+    least recently used entries first.
+    """
+
+    # Temporary files older than this are left over from failed or killed writes
+    stale_tmp_seconds = 3600
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def key(self, filename: str, **parameters: Any) -> str | None:
+        """Hash the source file identity together with the extraction parameters."""
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+
+        payload = {
+            "file": str(Path(filename).resolve()),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            **parameters,
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.parquet"
+
+    def get(self, key: str | None) -> dict[str, np.ndarray] | None:
+        if key is None:
+            return None
+
+        path = self._path(key)
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # A truncated or corrupt entry is a miss, and is removed so it gets rewritten
+            path.unlink(missing_ok=True)
+            return None
+
+        return {column: df[column].to_numpy() for column in df.columns}
+
+    def put(self, key: str | None, features: dict[str, np.ndarray]):
+        if key is None:
+            return
+
+        # Write to a unique temporary file first so concurrent runs never read partial entries
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        try:
+            pd.DataFrame(features).to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes.
+
+        Temporary files of writes that failed or were killed are removed first.
+        """
+        stale = time.time() - self.stale_tmp_seconds
+        for path in self.directory.glob("*.tmp"):
+            try:
+                if path.stat().st_mtime < stale:
+                    path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                continue
+
+        entries = []
+        for path in self.directory.glob("*.parquet"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -13,6 +13,11 @@ def setup_logger(name: str, log_file: str, level=logging.INFO) -> logging.Logger
 
     logger = logging.getLogger(name)
     logger.setLevel(level)
+
+    # Loggers are shared by name, so a new setup replaces the previous file instead of adding to it
+    for old_handler in list(logger.handlers):
+        logger.removeHandler(old_handler)
+        old_handler.close()
     logger.addHandler(handler)
 
     return logger
@@ -0,0 +1,154 @@
+import cProfile
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process, or its peak where the current value is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process so far."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class Profiler:
+    """Times named pipeline stages and samples the peak RSS reached while each one runs.
+
+    Stages nest per thread, so a stage opened inside another is recorded as
+    "outer/inner". A background thread samples the RSS every `interval`
+    seconds while any stage is open; peaks shorter than that may be missed.
+    """
+
+    def __init__(self, logger=None, enabled: bool = True, interval: float = 0.1):
+        self.logger = logger
+        self.enabled = enabled
+        self.interval = interval
+
+        self.lock = threading.Lock()
+        self.records: list[dict] = []
+        self.open_records: list[dict] = []
+        self.local = threading.local()
+        self.sampler = None
+
+    def _stack(self) -> list[str]:
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def current_stages(self) -> list[str]:
+        """The stages open in the calling thread, outermost first."""
+        return list(self._stack())
+
+    @contextmanager
+    def within(self, stages: list[str]):
+        """Record the calling thread's stages under `stages`, e.g. those open in its parent."""
+        previous = self._stack()
+        self.local.stack = list(stages)
+        try:
+            yield
+        finally:
+            self.local.stack = previous
+
+    def _sample(self):
+        while True:
+            rss = current_rss_bytes()
+            with self.lock:
+                if not self.open_records:
+                    self.sampler = None
+                    return
+                for record in self.open_records:
+                    record["peak_rss_bytes"] = max(record["peak_rss_bytes"], rss)
+            time.sleep(self.interval)
+
+    @contextmanager
+    def stage(self, name: str, **metadata):
+        """Time the enclosed block and record it together with the given metadata."""
+        if not self.enabled:
+            yield
+            return
+
+        stack = self._stack()
+        stack.append(name)
+        rss = current_rss_bytes()
+        record = {"stage": "/".join(stack), **metadata, "thread": threading.current_thread().name,
+                  "start_rss_bytes": rss, "peak_rss_bytes": rss}
+
+        with self.lock:
+            self.open_records.append(record)
+            if self.sampler is None:
+                self.sampler = threading.Thread(
+                    target=self._sample, name="rss-sampler", daemon=True
+                )
+                self.sampler.start()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            rss = current_rss_bytes()
+            with self.lock:
+                self.open_records.remove(record)
+                record["peak_rss_bytes"] = max(record["peak_rss_bytes"], rss)
+                record["end_rss_bytes"] = rss
+                self.records.append(record)
+            stack.pop()
+
+            if self.logger is not None:
+                self.logger.info(
+                    "Stage %s took %.2fs (peak RSS %.0f MB)",
+                    record["stage"],
+                    record["seconds"],
+                    record["peak_rss_bytes"] / 1024**2,
+                )
+
+    def summary(self) -> dict:
+        """Total time and number of records of each stage name."""
+        summary = {}
+        for record in self.records:
+            stage = summary.setdefault(record["stage"], {"count": 0, "seconds": 0.0})
+            stage["count"] += 1
+            stage["seconds"] += record["seconds"]
+        return summary
+
+    def to_dict(self) -> dict:
+        return {
+            "stages": list(self.records),
+            "summary": self.summary(),
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+
+
+@contextmanager
+def cprofile_to(path):
+    """Profile the enclosed block of the calling thread with cProfile and dump the stats to `path`.
+
+    The dump is a standard pstats file (snakeviz, gprof2dot, ...). Worker
+    threads are not covered; run the whole process under `py-spy record`
+    to sample every thread instead.
+    """
+    if path is None:
+        yield
+        return
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        profile.dump_stats(str(path))
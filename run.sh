@@ -2,7 +2,11 @@
 
 # Exit on error, print commands
 set -ex
+configs=()
 for mass_cut in 6500 6750 7000 7250 7500 7750 8000 8250
 do
-    python3 diquark/analysis.py -c "diquark/config/New_Features/ATLAS_136_${mass_cut}_32j_5f.yaml"
+    configs+=("diquark/config/New_Features/ATLAS_136_${mass_cut}_32j_5f.yaml")
 done
+
+# All mass points run as one sweep process, sharing loaded data between them
+python3 diquark/analysis.py -c "${configs[@]}" --sweep-report results/sweep_timings.json
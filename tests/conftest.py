@@ -0,0 +1,40 @@
+import awkward as ak
+import numpy as np
+import pytest
+import uproot
+
+
+def write_jets(path, n_events, rng, basket_events=100):
+    """A Delphes-like TTree of jets, filled in baskets of basket_events events."""
+    branches = {"Jet": "int32", "Jet/Jet.PT": "var * float32", "Jet/Jet.Eta": "var * float32",
+                "Jet/Jet.Phi": "var * float32"}
+    with uproot.recreate(path) as f:
+        tree = f.mktree("Delphes", branches)
+        for start in range(0, n_events, basket_events):
+            n_jets = rng.integers(0, 12, min(basket_events, n_events - start)).astype(np.int32)
+            n_values = int(n_jets.sum())
+            tree.extend(
+                {
+                    "Jet": n_jets,
+                    "Jet/Jet.PT": ak.unflatten(
+                        rng.exponential(200, n_values).astype(np.float32), n_jets
+                    ),
+                    "Jet/Jet.Eta": ak.unflatten(
+                        rng.normal(0, 1.5, n_values).astype(np.float32), n_jets
+                    ),
+                    "Jet/Jet.Phi": ak.unflatten(
+                        rng.uniform(-np.pi, np.pi, n_values).astype(np.float32), n_jets
+                    ),
+                }
+            )
+
+
+@pytest.fixture
+def jet_files(tmp_path):
+    """Background datasets of 1200 and 350 events, in baskets of 100."""
+    rng = np.random.default_rng(5)
+    path_dict = {}
+    for key, n_events in {"BKG:large": 1200, "BKG:small": 350}.items():
+        path_dict[key] = tmp_path / f"{key.replace(':', '_')}.root"
+        write_jets(path_dict[key], n_events, rng)
+    return path_dict
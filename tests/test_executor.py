@@ -0,0 +1,37 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from diquark.data.file_index import FileIndex
+from diquark.data.loader import DataLoader
+from diquark.features.executor import FeatureExecutor
+from diquark.features.feature_extractor import FeatureExtractor
+
+
+@pytest.mark.parametrize(
+    "backend, step_size", [("pipeline", None), ("processes", None), ("threads", 100)]
+)
+@pytest.mark.parametrize("indexed", [False, True])
+def test_range_past_the_entries_gives_empty_columns(
+    tmp_path, jet_files, backend, step_size, indexed
+):
+    extractor = FeatureExtractor(6, 1500, 4000)
+    file_index = FileIndex(tmp_path / "index.json") if indexed else None
+    # BKG:small has 350 entries, so its range is empty
+    loader = DataLoader(jet_files, index_start=400, index_stop=800, branches=extractor.branches(),
+                        file_index=file_index, split_bytes=20000)
+    streamed = DataLoader(jet_files, index_start=400, index_stop=800, step_size=step_size,
+                          branches=extractor.branches(), file_index=file_index, split_bytes=20000)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        expected = FeatureExecutor(loader, extractor, "threads", max_workers=2).run(list(jet_files))
+        features = FeatureExecutor(streamed, extractor, backend, max_workers=2).run(list(jet_files))
+
+    assert len(expected["BKG:small"]["p_T_max"]) == 0
+    for key in jet_files:
+        assert list(features[key]) == list(expected[key])
+        for name, column in expected[key].items():
+            assert features[key][name].dtype == column.dtype
+            np.testing.assert_allclose(features[key][name], column, rtol=1e-12)
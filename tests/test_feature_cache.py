@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from diquark.utils.feature_cache import FeatureCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return FeatureCache(tmp_path / "cache", max_bytes=10**9)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "events.root"
+    path.write_bytes(b"events")
+    return path
+
+
+def test_round_trip(cache, source):
+    key = cache.key(source, n_jets=6)
+    features = {"p_T_max": np.array([1.5, 2.5, 3.5]), "jet_multiplicity": np.array([1, 2, 3])}
+
+    assert cache.get(key) is None
+    cache.put(key, features)
+
+    cached = cache.get(key)
+    assert list(cached) == list(features)
+    for name, column in features.items():
+        np.testing.assert_array_equal(cached[name], column)
+
+
+def test_key_depends_on_parameters_and_source(cache, source):
+    key = cache.key(source, n_jets=6)
+    assert cache.key(source, n_jets=6) == key
+    assert cache.key(source, n_jets=8) != key
+
+    source.write_bytes(b"other events")
+    assert cache.key(source, n_jets=6) != key
+
+
+def test_missing_source_is_not_cached(cache, tmp_path):
+    key = cache.key(tmp_path / "missing.root", n_jets=6)
+    assert key is None
+
+    cache.put(key, {"x": np.arange(3)})
+    assert cache.get(key) is None
+
+
+def test_corrupt_entry_is_a_miss_and_removed(cache, source):
+    key = cache.key(source, n_jets=6)
+    cache.put(key, {"x": np.arange(100.0)})
+
+    path = cache._path(key)
+    path.write_bytes(path.read_bytes()[:20])
+
+    assert cache.get(key) is None
+    assert not path.exists()
+
+    cache.put(key, {"x": np.arange(100.0)})
+    np.testing.assert_array_equal(cache.get(key)["x"], np.arange(100.0))
+
+
+def test_evicts_least_recently_used(tmp_path, source):
+    cache = FeatureCache(tmp_path / "cache", max_bytes=10**9)
+    keys = [cache.key(source, n_jets=n) for n in range(3)]
+    for age, key in zip((30, 20, 10), keys):
+        cache.put(key, {"x": np.arange(1000.0)})
+        mtime = cache._path(key).stat().st_mtime - age
+        os.utime(cache._path(key), (mtime, mtime))
+
+    # Room for two entries, and the oldest one was just used
+    entry_bytes = cache._path(keys[0]).stat().st_size
+    cache.get(keys[0])
+    cache.max_bytes = 2 * entry_bytes
+    cache.evict()
+
+    assert cache._path(keys[0]).exists()
+    assert not cache._path(keys[1]).exists()
+    assert cache._path(keys[2]).exists()
+
+
+def test_failed_put_leaves_no_temporary_file(cache, source, monkeypatch):
+    def fail(self, path, **kwargs):
+        path.write_bytes(b"partial")
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", fail)
+    with pytest.raises(OSError):
+        cache.put(cache.key(source, n_jets=6), {"x": np.arange(10)})
+
+    assert list(cache.directory.iterdir()) == []
+
+
+def test_evicts_stale_temporary_files(cache):
+    stale = cache.directory / "stale.0123.tmp"
+    fresh = cache.directory / "fresh.4567.tmp"
+    for path in (stale, fresh):
+        path.write_bytes(b"partial")
+    mtime = stale.stat().st_mtime - 2 * cache.stale_tmp_seconds
+    os.utime(stale, (mtime, mtime))
+
+    cache.evict()
+
+    assert not stale.exists()
+    # Possibly still being written by another run
+    assert fresh.exists()
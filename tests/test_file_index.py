@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from diquark.data.file_index import FileIndex
+from diquark.data.loader import DataLoader, merge_ranges
+
+BRANCHES = ["Jet", "Jet/Jet.PT", "Jet/Jet.Eta", "Jet/Jet.Phi"]
+
+
+@pytest.fixture
+def index(tmp_path):
+    return FileIndex(tmp_path / "index.json")
+
+
+def test_index_entry(index, jet_files):
+    entry = index.get(jet_files["BKG:large"], BRANCHES)
+    assert entry["entries"] == 1200
+    for branch in BRANCHES:
+        assert entry["branches"][branch]["basket_starts"] == list(range(0, 1300, 100))
+
+    # Reloaded from its file rather than rebuilt
+    assert FileIndex(index.path)._files == index._files
+
+
+@pytest.mark.parametrize(
+    "entry_start, entry_stop", [(0, None), (0, 1200), (150, 1050), (0, 5000), (1100, None)]
+)
+@pytest.mark.parametrize("max_bytes", [4000, 20000, 10**9])
+def test_entry_ranges_split_on_baskets(index, jet_files, entry_start, entry_stop, max_bytes):
+    filename = jet_files["BKG:large"]
+    ranges = index.entry_ranges(filename, BRANCHES, entry_start, entry_stop, max_bytes)
+    stop = 1200 if entry_stop is None else min(entry_stop, 1200)
+
+    # Contiguous, non-empty and covering the whole range
+    starts, stops = np.array(ranges).T
+    assert starts[0] == entry_start and stops[-1] == stop
+    np.testing.assert_array_equal(starts[1:], stops[:-1])
+    assert np.all(stops > starts)
+
+    # Cut only on basket boundaries, into no more parts than the bytes need
+    assert set(starts[1:].tolist()) <= set(range(0, 1200, 100))
+    total = index.compressed_bytes(filename, BRANCHES, entry_start, entry_stop)
+    assert len(ranges) <= max(1, -(-total // max_bytes))
+    if total > 2 * max_bytes and stop - entry_start > 200:
+        assert len(ranges) > 1
+
+
+@pytest.mark.parametrize(
+    "entry_start, entry_stop", [(1200, None), (1500, 2000), (300, 300), (500, 200)]
+)
+def test_entry_ranges_without_entries(index, jet_files, entry_start, entry_stop):
+    assert index.entry_ranges(jet_files["BKG:large"], BRANCHES, entry_start, entry_stop, 4000) == \
+        [(entry_start, entry_start)]
+
+
+def test_compressed_bytes(index, jet_files):
+    filename = jet_files["BKG:large"]
+    entry = index.get(filename, BRANCHES)
+    total = sum(entry["branches"][branch]["compressed_bytes"] for branch in BRANCHES)
+
+    assert index.compressed_bytes(filename, BRANCHES) == total
+    assert index.compressed_bytes(filename, BRANCHES, 300, 600) == int(total * 300 / 1200)
+    assert index.compressed_bytes(filename, BRANCHES, 900, 5000) == int(total * 300 / 1200)
+    assert index.compressed_bytes(filename, BRANCHES, 1300, 5000) == 0
+
+
+def test_merge_ranges_in_entry_order():
+    keys = ["BKG:a", "BKG:b", "BKG:c"]
+    # Largest first, as planned, with an empty range for a dataset without entries
+    ranges = [
+        ("BKG:a", 100, 400),
+        ("BKG:b", 0, 250),
+        ("BKG:a", 400, 500),
+        ("BKG:a", 0, 100),
+        ("BKG:c", 70, 70),
+    ]
+    results = [np.arange(entry_start, entry_stop) for _, entry_start, entry_stop in ranges]
+
+    merged = merge_ranges(keys, ranges, results, np.concatenate)
+
+    assert list(merged) == keys
+    np.testing.assert_array_equal(merged["BKG:a"], np.arange(500))
+    np.testing.assert_array_equal(merged["BKG:b"], np.arange(250))
+    assert len(merged["BKG:c"]) == 0
+
+
+def test_plan_largest_first(index, jet_files):
+    loader = DataLoader(
+        jet_files,
+        index_start=0,
+        index_stop=1000,
+        branches=BRANCHES,
+        file_index=index,
+        split_bytes=20000,
+    )
+    with pytest.warns(UserWarning, match="index_stop 1000 exceeds the 350 entries"):
+        ranges = loader.plan(list(jet_files))
+
+    for key, n_entries in [("BKG:large", 1000), ("BKG:small", 350)]:
+        key_ranges = sorted((start, stop) for range_key, start, stop in ranges if range_key == key)
+        assert key_ranges[0][0] == 0 and key_ranges[-1][1] == n_entries
+        assert all(stop == start for (_, stop), (start, _) in zip(key_ranges, key_ranges[1:]))
+
+    sizes = [
+        index.compressed_bytes(jet_files[key], BRANCHES, start, stop) for key, start, stop in ranges
+    ]
+    assert sizes == sorted(sizes, reverse=True)
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from diquark.data.preprocessor import Preprocessor
+
+
+def test_sample_weights_balance_signal():
+    preprocessor = Preprocessor({"oversampling": "weights"})
+    weights = preprocessor.sample_weights(np.array([1, 0, 0, 0, 1, 0]))
+    np.testing.assert_array_equal(weights, [2.0, 1.0, 1.0, 1.0, 2.0, 1.0])
+
+
+def test_sample_weights_without_signal():
+    preprocessor = Preprocessor({"oversampling": "weights"})
+    with pytest.raises(ValueError, match="No signal events"):
+        preprocessor.sample_weights(np.zeros(5, dtype=int))
+
+
+def test_no_sample_weights_when_oversampling_by_index():
+    assert Preprocessor({"oversampling": "indices"}).sample_weights(np.array([1, 0])) is None
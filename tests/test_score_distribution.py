@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import (
+    average_precision_score,
+    precision_recall_curve,
+    roc_auc_score,
+    roc_curve,
+)
+
+from diquark.evaluation.metrics import calculate_metrics
+from diquark.evaluation.score_distribution import ScoreDistribution
+
+CROSS_SECTIONS = {"SIG:Suu": 0.05, "BKG:ttbar": 8.0, "BKG:wjets": 3.0, "BKG:zjets": 1.0}
+
+
+@pytest.fixture
+def events():
+    rng = np.random.default_rng(3)
+    n_events = 2000
+    # zjets is unused, so the distribution must skip absent categories
+    truth = pd.Categorical(rng.choice(["SIG:Suu", "BKG:ttbar", "BKG:wjets"], n_events),
+                           categories=list(CROSS_SECTIONS))
+    # Scores on a coarse grid, so many events tie with each other and with the thresholds
+    y_pred = np.round(rng.random(n_events), 2)
+    return y_pred, truth
+
+
+def brute_force(y_pred, truth, thresholds, inclusive):
+    """Counts and weights per process passing each threshold, with one mask per threshold."""
+    truth = np.asarray(truth)
+    processes = sorted(set(truth), key=list(CROSS_SECTIONS).index)
+    counts = np.array([[np.sum((truth == process) & ((y_pred >= t) if inclusive else (y_pred > t)))
+                        for t in thresholds] for process in processes])
+    weights = counts * np.array([CROSS_SECTIONS[process] for process in processes])[:, None]
+    return processes, counts, weights
+
+
+@pytest.mark.parametrize("inclusive", [False, True])
+def test_passing_counts_and_weights_match_masks(events, inclusive):
+    y_pred, truth = events
+    distribution = ScoreDistribution(y_pred, truth, CROSS_SECTIONS)
+    # Thresholds on the score grid (ties), between grid points and outside the scores
+    thresholds = np.r_[-1.0, 0.0, 0.005, 0.25, 0.5, 0.505, 0.99, 1.0, 2.0]
+
+    processes, counts, weights = brute_force(y_pred, truth, thresholds, inclusive)
+
+    assert list(distribution.processes) == processes
+    np.testing.assert_array_equal(distribution.passing_counts(thresholds, inclusive), counts)
+    np.testing.assert_allclose(distribution.passing_weights(thresholds, inclusive), weights)
+
+    is_signal = np.array(["SIG" in process for process in processes])
+    background, signal = distribution.class_weights(thresholds, inclusive)
+    np.testing.assert_allclose(background, weights[~is_signal].sum(axis=0))
+    np.testing.assert_allclose(signal, weights[is_signal].sum(axis=0))
+
+
+def test_totals(events):
+    y_pred, truth = events
+    distribution = ScoreDistribution(y_pred, truth, CROSS_SECTIONS)
+
+    _, counts, weights = brute_force(y_pred, truth, [-np.inf], inclusive=True)
+    np.testing.assert_array_equal(distribution.process_counts(), counts[:, 0])
+
+    background, signal = distribution.class_totals()
+    weight = np.array([CROSS_SECTIONS[process] for process in np.asarray(truth)])
+    assert background == pytest.approx(weight[truth != "SIG:Suu"].sum())
+    assert signal == pytest.approx(weight[truth == "SIG:Suu"].sum())
+
+
+def test_thresholds(events):
+    y_pred, truth = events
+    distribution = ScoreDistribution(y_pred, truth, CROSS_SECTIONS)
+    quantiles = [0.0, 0.2, 0.5, 0.9, 0.99, 1.0]
+
+    np.testing.assert_array_equal(
+        distribution.thresholds(quantiles, False), np.quantile(y_pred, quantiles)
+    )
+
+    # Weighted percentiles: the first score whose cumulative weight reaches the quantile
+    order = np.argsort(y_pred, kind="stable")
+    cumulative = np.cumsum(
+        np.array([CROSS_SECTIONS[process] for process in np.asarray(truth)])[order]
+    )
+    expected = [y_pred[order[min(np.searchsorted(cumulative, q * cumulative[-1]), len(y_pred) - 1)]]
+                for q in quantiles]
+    np.testing.assert_array_equal(distribution.thresholds(quantiles, True), expected)
+
+
+def test_curves_match_sklearn(events):
+    y_pred, truth = events
+    distribution = ScoreDistribution(y_pred, truth, CROSS_SECTIONS)
+    y_true = (truth == "SIG:Suu").astype(int)
+
+    fpr, tpr, roc_thresholds = distribution.roc_curve()
+    expected_fpr, expected_tpr, expected_thresholds = roc_curve(
+        y_true, y_pred, drop_intermediate=False
+    )
+    np.testing.assert_allclose(fpr, expected_fpr)
+    np.testing.assert_allclose(tpr, expected_tpr)
+    np.testing.assert_array_equal(roc_thresholds, expected_thresholds)
+
+    precision, recall, pr_thresholds = distribution.precision_recall_curve()
+    expected_precision, expected_recall, expected_thresholds = precision_recall_curve(
+        y_true, y_pred
+    )
+    np.testing.assert_allclose(precision, expected_precision)
+    np.testing.assert_allclose(recall, expected_recall)
+    np.testing.assert_array_equal(pr_thresholds, expected_thresholds)
+
+
+def test_metrics_match_sklearn(events):
+    y_pred, truth = events
+    distribution = ScoreDistribution(y_pred, truth, CROSS_SECTIONS)
+    y_true = (truth == "SIG:Suu").astype(int)
+
+    metrics = calculate_metrics(distribution, [0.2, 0.5, 0.9], use_real_event_percentiles=False)
+    assert metrics["roc_auc"] == pytest.approx(roc_auc_score(y_true, y_pred))
+    assert metrics["average_precision"] == pytest.approx(average_precision_score(y_true, y_pred))
@@ -0,0 +1,63 @@
+import pytest
+import uproot
+
+from diquark.data.loader import DataLoader
+from diquark.data.skim import SkimStore
+
+BRANCHES = ["Jet", "Jet/Jet.PT", "Jet/Jet.Eta", "Jet/Jet.Phi"]
+
+
+@pytest.fixture
+def skims(tmp_path):
+    return SkimStore(tmp_path / "skims", row_group_size=100)
+
+
+def read_chunks(filename, fail_after=None):
+    with uproot.open(filename) as f:
+        for i, chunk in enumerate(f["Delphes"].iterate(BRANCHES, step_size=100, library="ak")):
+            if i == fail_after:
+                raise OSError("Read failed")
+            yield chunk
+
+
+def test_write_and_read(skims, jet_files):
+    filename = jet_files["BKG:large"]
+    manifest = skims.write(filename, read_chunks(filename))
+
+    assert manifest["n_entries"] == 1200
+    assert skims.is_fresh(filename, BRANCHES)
+    with uproot.open(filename) as f:
+        expected = f["Delphes"].arrays(BRANCHES, entry_start=250, entry_stop=730, library="ak")
+    arr = skims.read(filename, BRANCHES, 250, 730)
+    for branch in BRANCHES:
+        assert arr[branch].tolist() == expected[branch].tolist()
+
+
+def test_failed_write_leaves_no_files(skims, jet_files):
+    filename = jet_files["BKG:large"]
+    with pytest.raises(OSError, match="Read failed"):
+        skims.write(filename, read_chunks(filename, fail_after=4))
+
+    assert list(skims.directory.iterdir()) == []
+    assert not skims.is_fresh(filename, BRANCHES)
+
+
+@pytest.mark.parametrize("step_size", [None, 100])
+def test_skim_reads_are_recorded_under_the_skim(tmp_path, jet_files, step_size):
+    loader = DataLoader(jet_files, step_size=step_size, branches=BRANCHES,
+                        skim_dir=tmp_path / "skims")
+    loader.skim_data(["BKG:large"])
+    # Skimming read the ROOT file itself
+    loader.read_stats.clear()
+
+    for key in jet_files:
+        if step_size is None:
+            loader.load_dataset(key)
+        else:
+            list(loader.iterate_jet_delphes(jet_files[key]))
+
+    skim_path = str(loader.skims.path(jet_files["BKG:large"]))
+    summary = loader.read_summary()
+    assert set(summary) == {skim_path, str(jet_files["BKG:small"])}
+    skim_bytes = loader.skims.manifest(jet_files["BKG:large"])["bytes"]
+    assert summary[skim_path]["mb"] == skim_bytes / 1024**2